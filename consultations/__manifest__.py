@@ -4,12 +4,20 @@
     'summary': 'Manage Patient Appointments',
     'sequence': 10,
     'category': 'Healthcare',
-    'depends': ['base', 'contacts'],
+    'depends': ['base', 'contacts', 'account'],
     'data': [
         'security/ir.model.access.csv',
         'views/appointment_booking.xml',
         'views/consultation_doctor.xml',
+        'views/res_partner.xml',
+        'views/consultation_fee_rule.xml',
+        'views/migration_job.xml',
+        'views/appointment_daily_load.xml',
         'data/appointment_op_number_sequence.xml',  # Ensure correct path
+        'data/appointment_billing_cron.xml',
+        'data/consultation_fee_rule_data.xml',
+        'data/migration_job_cron.xml',
+        'data/appointment_daily_load_cron.xml',
     ],
     'installable': True,
     'application': True,
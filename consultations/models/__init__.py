@@ -1,3 +1,9 @@
+from . import custom_contacts
 from . import appointment_booking
 from . import consultation_doctor
 from .import op_bill
+from . import op_number_allocator
+from . import patient_stats
+from . import consultation_fee_rule
+from . import migration_job
+from . import appointment_daily_load
@@ -1,5 +1,8 @@
 import logging
+import threading
+import time
 from odoo import api, fields, models, _
+from odoo.tools import split_every
 from datetime import datetime
 from odoo.exceptions import ValidationError
 import re
@@ -11,6 +14,11 @@ class AppointmentBooking(models.Model):
     _name = "appointment.booking"
     _description = "Appointment Booking"
 
+    # Appointments created per batch when syncing TAF bookings
+    SYNC_BATCH_SIZE = 500
+    # Bookings invoiced per batch by the background billing cron
+    BILLING_BATCH_SIZE = 200
+
     patient_id = fields.Many2one(
     'res.partner', 
     string="Patient", 
@@ -18,7 +26,7 @@ class AppointmentBooking(models.Model):
     help="Select existing patient or create a new one via popup.",
 )
     name = fields.Char(string="Patient Name", required=True)
-    reference_id = fields.Char(string="Patient Reference ID",copy=False)
+    reference_id = fields.Char(string="Patient Reference ID",copy=False, index=True)
     gender = fields.Selection([
         ('male', 'Male'),
         ('female', 'Female'),
@@ -68,21 +76,21 @@ class AppointmentBooking(models.Model):
         help="Automatically linked Doctor Appointment"
     )
 
-    @api.depends('phone')
+    @api.depends('phone', 'department', 'consultation_doctor', 'consultation_mode')
     def _compute_payment(self):
-        """Set payment and currency based on phone country code."""
+        """Set payment and currency from the best matching consultation fee rule."""
+        FeeRule = self.env['consultation.fee.rule']
+        default_currency = False
         for record in self:
-            if record.phone == '+1':
-                record.payment = 30
-                record.payment_currency_id = self.env.ref('base.USD').id  # USD
-            elif record.phone == '+91':
-                record.payment = 500
-                record.payment_currency_id = self.env.ref('base.INR').id  # INR
+            fee = FeeRule._match_fee(record.phone, record.department, record.consultation_doctor.id, record.consultation_mode)
+            if fee:
+                record.payment, record.payment_currency_id = fee
             else:
+                default_currency = default_currency or self.env.ref('base.INR')
                 record.payment = 500  # Default case
-                record.payment_currency_id = self.env.ref('base.INR').id  # Default INR
+                record.payment_currency_id = default_currency  # Default INR
 
-    payment = fields.Integer(string="Fee", compute="_compute_payment", readonly=False)
+    payment = fields.Integer(string="Fee", compute="_compute_payment", store=True, readonly=False)
     payment_currency_id = fields.Many2one('res.currency', string="Currency", compute="_compute_payment", store=True)
 
     @api.constrains('name')
@@ -144,14 +152,12 @@ class AppointmentBooking(models.Model):
 
     @api.depends('patient_id')
     def _compute_patient_type(self):
-        """Determine if the patient is new or old."""
+        """Determine if the patient is new or old from the patient visit statistics."""
+        stats_by_patient = self.env['appointment.patient.stats']._get_for_patients(self.patient_id.ids)
         for record in self:
-            if record.patient_id:
-                previous_appointments = self.env['appointment.booking'].search_count([
-                    ('patient_id', '=', record.patient_id.id),
-                    ('id', '!=', record.id)
-                ])
-                record.patient_type = 'old' if previous_appointments > 0 else 'new'
+            stats = stats_by_patient.get(record.patient_id.id)
+            if stats and stats.first_booking_id and stats.first_booking_id.id != record.id:
+                record.patient_type = 'old'
             else:
                 record.patient_type = 'new'
 
@@ -170,34 +176,20 @@ class AppointmentBooking(models.Model):
         return f'EHH-{patient_id:06d}'
 
     invoice_id = fields.Many2one('account.move', string="Invoice", readonly=True)
+    billing_queued = fields.Boolean(string="Queued for Billing", copy=False, readonly=True)
+    billing_error = fields.Text(string="Billing Error", copy=False, readonly=True)
 
     def action_pay_now(self):
         """Create an Invoice with the correct currency based on the country code"""
+        self.ensure_one()
         if not self.patient_id:
             raise ValidationError("A Patient is required to create an invoice.")
 
-        # Step 1: Determine Currency
-        currency_id = self.payment_currency_id.id if self.payment_currency_id else self.env.ref('base.INR').id
-        payment_amount = self.payment
-
-        # Step 2: Create the Invoice
-        invoice = self.env['account.move'].create({
-            'partner_id': self.patient_id.id,
-            'move_type': 'out_invoice',
-            'currency_id': currency_id,  # Set currency dynamically
-            'invoice_line_ids': [(0, 0, {
-                'name': f"Appointment with {self.consultation_doctor.name}",
-                'quantity': 1,
-                'price_unit': payment_amount,
-                'account_id': self.env['account.account'].search([('account_type', '=', 'income')], limit=1).id,
-            })],
-        })
-        self.invoice_id = invoice.id  # Link invoice to the appointment
-
-        # Step 3: Validate (Post) the Invoice
-        invoice.action_post()
+        invoice = self.invoice_id or self._create_invoices()[0]
+        if not invoice:
+            raise ValidationError("A cancelled appointment cannot be invoiced.")
 
-        # Step 4: Redirect to the Invoice Form View
+        # Redirect to the Invoice Form View
         return {
             'type': 'ir.actions.act_window',
             'name': 'Customer Invoice',
@@ -206,33 +198,187 @@ class AppointmentBooking(models.Model):
             'res_id': invoice.id,
             'target': 'current',
         }
-    
+
+    def action_bill_bookings(self):
+        """Invoice the selected bookings in one batch and report how long it took."""
+        invoices, timing = self._create_invoices()
+        return self._billing_notification(_(
+            "%(bookings)s bookings billed in %(invoices)s invoices in %(total).2fs "
+            "(create %(create).2fs, post %(post).2fs).",
+            bookings=timing.get('bookings', 0), invoices=len(invoices), total=timing.get('total', 0.0),
+            create=timing.get('create', 0.0), post=timing.get('post', 0.0),
+        ))
+
+    def action_bill_in_background(self):
+        """Queue the selected bookings for the billing cron instead of invoicing them now."""
+        queued = self.filtered(lambda booking: booking.patient_id and not booking.invoice_id and booking.state != 'cancelled')
+        queued.write({'billing_queued': True, 'billing_error': False})
+        cron = self.env.ref('consultations.ir_cron_bill_queued_bookings', raise_if_not_found=False)
+        if cron:
+            cron._trigger()
+        return self._billing_notification(_("%s bookings queued for billing.", len(queued)))
+
+    def _billing_notification(self, message):
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _("Billing"),
+                'message': message,
+                'type': 'success',
+                'next': {'type': 'ir.actions.act_window_close'},
+            },
+        }
+
+    def _create_invoices(self):
+        """Invoice the billable bookings of ``self``, one invoice per patient and currency.
+
+        Account and currency are looked up once for the batch, all invoices
+        are created with one ``create`` and posted with one ``action_post``.
+        Returns ``(invoices, timing)``.
+        """
+        start = time.perf_counter()
+        bookings = self.filtered(lambda booking: booking.patient_id and not booking.invoice_id and booking.state != 'cancelled')
+        if not bookings:
+            return self.env['account.move'], {}
+
+        # Lookups shared by the whole batch
+        default_currency = self.env.ref('base.INR')
+        income_account = self.env['account.account'].search([('account_type', '=', 'income')], limit=1)
+
+        groups = {}
+        for booking in bookings:
+            currency = booking.payment_currency_id or default_currency
+            groups.setdefault((booking.patient_id.id, currency.id), []).append(booking)
+
+        invoices = self.env['account.move'].create([{
+            'partner_id': partner_id,
+            'move_type': 'out_invoice',
+            'currency_id': currency_id,  # Set currency dynamically
+            'invoice_line_ids': [(0, 0, {
+                'name': f"Appointment with {booking.consultation_doctor.name}",
+                'quantity': 1,
+                'price_unit': booking.payment,
+                'account_id': income_account.id,
+            }) for booking in group],
+        } for (partner_id, currency_id), group in groups.items()])
+        for invoice, group in zip(invoices, groups.values()):
+            self.browse(booking.id for booking in group).write({'invoice_id': invoice.id, 'billing_queued': False})
+        created = time.perf_counter()
+
+        invoices.action_post()
+        posted = time.perf_counter()
+
+        timing = {
+            'bookings': len(bookings),
+            'create': created - start,
+            'post': posted - created,
+            'total': posted - start,
+        }
+        _logger.info("🧾 Billed %d bookings into %d invoices in %.2fs (create %.2fs, post %.2fs).",
+                     len(bookings), len(invoices), timing['total'], timing['create'], timing['post'])
+        return invoices, timing
 
     @api.model
-    def create(self, vals):
-        """Ensure correct Reference ID and OP Number while importing or creating records."""
-        if vals.get('patient_id'):
-            existing_ref_id = self.env['appointment.booking'].search([
-                ('patient_id', '=', vals['patient_id'])
-            ], limit=1).reference_id
- 
-            # Use imported reference_id if provided, else use existing or generate new
-            if not vals.get('reference_id'):
-                vals['reference_id'] = existing_ref_id or self._generate_reference_id(vals['patient_id'])
- 
+    def _cron_bill_queued_bookings(self):
+        """Invoice the bookings queued for billing, committing after each batch.
+
+        A failing batch is retried one booking at a time; the bookings that
+        still fail leave the queue with their error, so they cannot block
+        the bookings behind them.
+        """
+        while True:
+            bookings = self.search([('billing_queued', '=', True)], limit=self.BILLING_BATCH_SIZE)
+            if not bookings:
+                break
+            try:
+                with self.env.cr.savepoint():
+                    bookings._create_invoices()
+            except Exception:
+                _logger.warning("⚠️ Background billing of %d bookings failed, billing them one by one", len(bookings))
+                self.env.invalidate_all(flush=False)
+                bookings._bill_one_by_one()
+            # Bookings skipped by _create_invoices (cancelled or already invoiced) leave the queue too
+            bookings.filtered('billing_queued').write({'billing_queued': False})
+            if not getattr(threading.current_thread(), 'testing', False):
+                self.env.cr.commit()
+            if len(bookings) < self.BILLING_BATCH_SIZE:
+                break
+
+    def _bill_one_by_one(self):
+        """Invoice each booking in its own savepoint, un-queuing and flagging the ones that fail."""
+        for booking in self:
+            try:
+                with self.env.cr.savepoint():
+                    booking._create_invoices()
+            except Exception as e:
+                _logger.exception("❌ Background billing failed for booking %s", booking.id)
+                self.env.invalidate_all(flush=False)
+                booking.write({'billing_queued': False, 'billing_error': str(e)})
+
+    def init(self):
+        self.env['res.partner']._create_trigram_indexes('appointment_booking', ['name', 'phone', 'email', 'reference_id'])
+        # Register the reference id of patients booked before the registry existed on their partner
+        self.env.cr.execute("""
+            WITH first_reference AS (
+                SELECT DISTINCT ON (patient_id) patient_id, reference_id
+                  FROM appointment_booking
+                 WHERE reference_id IS NOT NULL AND reference_id != ''
+                 ORDER BY patient_id, id
+            ), owner AS (
+                SELECT DISTINCT ON (reference_id) patient_id, reference_id
+                  FROM first_reference
+                 ORDER BY reference_id, patient_id
+            )
+            UPDATE res_partner partner
+               SET patient_reference_id = owner.reference_id
+              FROM owner
+             WHERE partner.id = owner.patient_id
+               AND partner.patient_reference_id IS NULL
+               AND NOT EXISTS (
+                   SELECT 1 FROM res_partner other WHERE other.patient_reference_id = owner.reference_id
+               )
+        """)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        """Ensure correct Reference ID and OP Number while importing or creating records.
+
+        Reference ids of all patients are resolved from the partner registry
+        in one query (registering missing ones with one update) and OP
+        numbers reserved in one step, then the bookings and their doctor
+        appointments are created with one batched insert each.
+        """
+        patient_ids = list({vals['patient_id'] for vals in vals_list if vals.get('patient_id')})
+        patients = self.env['res.partner'].browse(patient_ids)
+        # Patients without a registered reference take the first imported one of the batch
+        proposed = {}
+        for vals in vals_list:
+            if vals.get('patient_id') and vals.get('reference_id'):
+                proposed.setdefault(vals['patient_id'], vals['reference_id'])
+        ref_by_patient = patients._get_patient_reference_ids(self._generate_reference_id, proposed)
+        name_by_patient = {patient.id: patient.name for patient in patients}
+
+        for vals in vals_list:
+            if vals.get('patient_id'):
+                # Use imported reference_id if provided, else the patient's registered one
+                if not vals.get('reference_id'):
+                    vals['reference_id'] = ref_by_patient.get(vals['patient_id']) or self._generate_reference_id(vals['patient_id'])
+                vals['name'] = name_by_patient[vals['patient_id']]
+
         # Use imported OP number if provided, else generate a new one
-        if not vals.get('op_number') or vals.get('op_number') == 'New':
-            vals['op_number'] = self.env['ir.sequence'].next_by_code('appointment.op_number') or '0000'
- 
-        if vals.get('patient_id'):
-            patient = self.env['res.partner'].browse(vals['patient_id'])
-            vals['name'] = patient.name
- 
-        # Create the record
-        booking = super(AppointmentBooking, self).create(vals)
-
-        # Create associated doctor appointment
-        doctor_appointment = self.env['doctor.appointments'].create({
+        missing_op = [vals for vals in vals_list if not vals.get('op_number') or vals.get('op_number') == 'New']
+        for vals, op_number in zip(missing_op, self._reserve_op_numbers(len(missing_op))):
+            vals['op_number'] = op_number
+
+        # Create the records
+        bookings = super(AppointmentBooking, self).create(vals_list)
+        # Statistics first: patient_type is computed from them below
+        self.env['appointment.patient.stats']._add_bookings(bookings)
+        self.env['appointment.daily.load.dirty']._mark(bookings.mapped('appointment_date'))
+
+        # Create associated doctor appointments
+        doctor_appointments = self.env['doctor.appointments'].create([{
             'booking_id': booking.id,
             'patient_id': booking.patient_id.id,
             'appointment_date': booking.appointment_date,
@@ -243,11 +389,40 @@ class AppointmentBooking(models.Model):
             'consultation_doctor': booking.consultation_doctor.id if booking.consultation_doctor else False,
             'consultation_mode': booking.consultation_mode,
             'patient_type': booking.patient_type,  # Ensure patient_type is stored correctly
+        } for booking in bookings])
+
+        for booking, doctor_appointment in zip(bookings, doctor_appointments):
+            booking.doctor_appointment_id = doctor_appointment.id
+        return bookings
 
-        })
+    def write(self, vals):
+        """Keep the patient visit statistics and daily load in line with changed bookings."""
+        tracked = {'patient_id', 'state', 'appointment_date', 'consultation_doctor', 'reference_id'}
+        patient_ids = set(self.patient_id.ids) if tracked.intersection(vals) else set()
+        # Days whose daily load counts change
+        load_fields = {'appointment_date', 'consultation_doctor', 'department', 'consultation_mode', 'state', 'patient_id'}
+        days = set(self.mapped('appointment_date')) if load_fields.intersection(vals) else set()
+        res = super().write(vals)
+        if patient_ids:
+            patient_ids.update(self.patient_id.ids)
+            self.env['appointment.patient.stats']._refresh_patients(patient_ids)
+        if days:
+            days.update(self.mapped('appointment_date'))
+            self.env['appointment.daily.load.dirty']._mark(days)
+        return res
 
-        booking.doctor_appointment_id = doctor_appointment.id
-        return booking
+    def unlink(self):
+        """Recompute the visit statistics and daily load of the deleted bookings."""
+        patient_ids = self.patient_id.ids
+        days = self.mapped('appointment_date')
+        res = super().unlink()
+        self.env['appointment.patient.stats']._refresh_patients(patient_ids)
+        self.env['appointment.daily.load.dirty']._mark(days)
+        return res
+
+    def _reserve_op_numbers(self, count):
+        """Return ``count`` new OP numbers, served from this worker's reserved block."""
+        return self.env['appointment.op.number.allocator'].allocate(count)
 
     def action_cancel(self):
         """Cancel an appointment."""
@@ -257,21 +432,41 @@ class AppointmentBooking(models.Model):
 
     @api.model
     def sync_taf_bookings(self):
-        """Sync new records from taf.bookings into appointment.booking automatically."""
-        taf_bookings = self.env['taf.bookings'].search([])
-        for taf in taf_bookings:
-            existing_appointment = self.env['appointment.booking'].search([
-                ('reference_id', '=', f'TAF-{taf.user_id.id}')
-            ], limit=1)
-
-            if not existing_appointment:
-                self.create({
-                    'name': taf.patient_name,
-                    'email': taf.email,
-                    'phone': taf.phone,
-                    'appointment_date': taf.booking_date or fields.Date.today(),
-                    'patient_id': taf.user_id.id,
-                    'state': 'booked',
-                    'reference_id': f'TAF-{taf.user_id.id}',
-                })
-                _logger.info("✅ Synced taf.bookings record to appointment.booking for: %s", taf.patient_name)
+        """Sync new records from taf.bookings into appointment.booking automatically.
+
+        A single anti-join finds the TAF bookings whose patient has no
+        ``TAF-<partner id>`` appointment yet (the first booking per patient),
+        then the missing appointments are created in batches.
+        """
+        if 'taf.bookings' not in self.env:
+            return 0
+        started = time.perf_counter()
+        TafBookings = self.env['taf.bookings']
+        TafBookings.flush_model(['user_id'])
+        self.flush_model(['reference_id'])
+        self.env.cr.execute("""
+            SELECT DISTINCT ON (taf.user_id) taf.id
+              FROM taf_bookings taf
+             WHERE NOT EXISTS (
+                   SELECT 1
+                     FROM appointment_booking booking
+                    WHERE booking.reference_id = 'TAF-' || taf.user_id
+             )
+             ORDER BY taf.user_id, taf.id
+        """)
+        taf_ids = [row[0] for row in self.env.cr.fetchall()]
+
+        for batch_ids in split_every(self.SYNC_BATCH_SIZE, taf_ids):
+            self.create([{
+                'name': taf.patient_name,
+                'email': taf.email,
+                'phone': taf.phone,
+                'appointment_date': taf.booking_date or fields.Date.today(),
+                'patient_id': taf.user_id.id,
+                'state': 'booked',
+                'reference_id': f'TAF-{taf.user_id.id}',
+            } for taf in TafBookings.browse(batch_ids)])
+
+        _logger.info("✅ Synced %d taf.bookings records to appointment.booking in %.2fs.",
+                     len(taf_ids), time.perf_counter() - started)
+        return len(taf_ids)
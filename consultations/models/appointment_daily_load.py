@@ -0,0 +1,105 @@
+import logging
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+
+class AppointmentDailyLoadDirty(models.Model):
+    """Days whose daily load must be rebuilt.
+
+    Append-only: each transaction inserts its own rows, so concurrent
+    bookings never wait on each other, and a refresh only consumes the rows
+    its snapshot can see.
+    """
+    _name = 'appointment.daily.load.dirty'
+    _description = 'Daily Appointment Load Refresh Queue'
+    _log_access = False
+
+    day = fields.Date(string="Day", required=True)
+
+    @api.model
+    def _mark(self, days):
+        """Queue ``days`` for the next daily load refresh."""
+        days = sorted({day for day in days if day})
+        if days:
+            self.env.cr.execute("INSERT INTO appointment_daily_load_dirty (day) SELECT unnest(%s::date[])", [days])
+
+
+class AppointmentDailyLoad(models.Model):
+    """Booking counts per day, doctor, department, mode, state and patient type.
+
+    Rows are rebuilt a whole day at a time from ``appointment_booking``.
+    Booking changes only queue their dates in
+    ``appointment.daily.load.dirty``; a cron rebuilds the queued days (run
+    right away when the dashboard opens), so the dashboard reads a few rows
+    per day instead of every booking.
+    """
+    _name = 'appointment.daily.load'
+    _description = 'Daily Appointment Load'
+    _order = 'date desc, booking_count desc'
+    _rec_name = 'date'
+
+    date = fields.Date(string="Date", required=True, index=True, readonly=True)
+    consultation_doctor = fields.Many2one('consultation.doctor', string="Consultation Doctor", readonly=True)
+    department = fields.Selection(
+        selection=lambda self: self.env['appointment.booking']._fields['department'].selection,
+        string="Department", readonly=True)
+    consultation_mode = fields.Selection([('online', 'Online'), ('offline', 'Offline')],
+                                         string="Consultation Mode", readonly=True)
+    state = fields.Selection(
+        selection=lambda self: self.env['appointment.booking']._fields['state'].selection,
+        string="Status", readonly=True)
+    patient_type = fields.Selection([('new', 'New Patient'), ('old', 'Old Patient')],
+                                    string="Patient Type", readonly=True)
+    booking_count = fields.Integer(string="Bookings", readonly=True)
+
+    _GROUP_COLUMNS = 'consultation_doctor, department, consultation_mode, state, patient_type'
+
+    def init(self):
+        # Build the aggregates of the bookings made before this table existed
+        self.env.cr.execute("SELECT 1 FROM appointment_daily_load LIMIT 1")
+        if not self.env.cr.rowcount:
+            self.env.cr.execute("""
+                INSERT INTO appointment_daily_load_dirty (day)
+                SELECT DISTINCT appointment_date FROM appointment_booking WHERE appointment_date IS NOT NULL
+            """)
+
+    @api.model
+    def _refresh_dirty_dates(self):
+        """Rebuild the aggregates of the queued days with one DELETE and one INSERT."""
+        self.env['appointment.booking'].flush_model()
+        cr = self.env.cr
+        cr.execute("DELETE FROM appointment_daily_load_dirty RETURNING day")
+        days = sorted({row[0] for row in cr.fetchall()})
+        if not days:
+            return 0
+        cr.execute("DELETE FROM appointment_daily_load WHERE date = ANY(%s)", [days])
+        cr.execute("""
+            INSERT INTO appointment_daily_load (date, {columns}, booking_count,
+                                                create_uid, create_date, write_uid, write_date)
+            SELECT appointment_date, {columns}, COUNT(*),
+                   %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+              FROM appointment_booking
+             WHERE appointment_date = ANY(%(days)s)
+             GROUP BY appointment_date, {columns}
+        """.format(columns=self._GROUP_COLUMNS), {'days': days, 'uid': self.env.uid})
+        self.invalidate_model()
+        _logger.info("📊 Refreshed the daily load of %d days.", len(days))
+        return len(days)
+
+    @api.model
+    def _cron_refresh(self):
+        self._refresh_dirty_dates()
+
+    @api.model
+    def action_open_dashboard(self):
+        """Open the dashboard and have the cron rebuild the queued days.
+
+        The rebuild is left to the cron so that opening the dashboard only
+        reads and concurrent opens never race on the same rows.
+        """
+        cron = self.env.ref('consultations.ir_cron_refresh_daily_load', raise_if_not_found=False)
+        if cron:
+            cron._trigger()
+        return self.env['ir.actions.act_window']._for_xml_id('consultations.appointment_daily_load_action')
@@ -0,0 +1,104 @@
+import re
+
+from odoo import api, fields, models, tools
+
+# Cursor cache key of the rules version read by _get_rules_version
+RULES_VERSION_KEY = 'consultation_fee_rule_version'
+
+
+class ConsultationFeeRule(models.Model):
+    """Consultation fee by caller country, department, doctor and mode.
+
+    Rules are matched on the longest dial prefix first; among rules with the
+    same prefix the one constraining most criteria wins, then ``sequence``.
+    Matching runs on an in-memory index cached per registry under the
+    version of the rules, so a rule change only replaces this index, in
+    every worker, and resolving fees costs one small query per transaction.
+    """
+    _name = 'consultation.fee.rule'
+    _description = 'Consultation Fee Rule'
+    _order = 'sequence, id'
+
+    name = fields.Char(string="Name", required=True)
+    sequence = fields.Integer(string="Sequence", default=10)
+    active = fields.Boolean(string="Active", default=True)
+    dial_prefix = fields.Char(string="Country Dial Prefix",
+                              help="Phone prefix such as +91 or +1. Leave empty to match any number.")
+    department = fields.Selection(
+        selection=lambda self: self.env['appointment.booking']._fields['department'].selection,
+        string="Department", help="Leave empty to match any department.")
+    doctor_id = fields.Many2one('consultation.doctor', string="Doctor", ondelete='cascade',
+                                help="Leave empty to match any doctor.")
+    consultation_mode = fields.Selection([('online', 'Online'), ('offline', 'Offline')],
+                                         string="Consultation Mode", help="Leave empty to match any mode.")
+    amount = fields.Integer(string="Fee", required=True)
+    currency_id = fields.Many2one('res.currency', string="Currency", required=True)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        rules = super().create(vals_list)
+        self.env.cr.cache.pop(RULES_VERSION_KEY, None)
+        return rules
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.env.cr.cache.pop(RULES_VERSION_KEY, None)
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.cr.cache.pop(RULES_VERSION_KEY, None)
+        return res
+
+    @api.model
+    def _get_rules_version(self):
+        """Return a key that changes whenever a rule is created, changed or deleted, read once per transaction."""
+        if RULES_VERSION_KEY not in self.env.cr.cache:
+            self.flush_model()
+            self.env.cr.execute("SELECT COUNT(*), MAX(id), MAX(write_date) FROM consultation_fee_rule")
+            self.env.cr.cache[RULES_VERSION_KEY] = self.env.cr.fetchone()
+        return self.env.cr.cache[RULES_VERSION_KEY]
+
+    @api.model
+    def _normalize_phone(self, phone):
+        """Strip a phone number down to digits with an international ``+`` prefix."""
+        number = re.sub(r'[^\d+]', '', phone or '')
+        if number.startswith('00'):
+            number = '+' + number[2:]
+        return number
+
+    @api.model
+    @tools.ormcache('version')
+    def _get_fee_index(self, version):
+        """Return ``(prefix lengths, {prefix: rules})`` of the active rules, longest prefix first.
+
+        Each rule is ``((department, doctor_id, mode), amount, currency_id)``,
+        most specific first; ``None`` criteria match anything. ``version``
+        (from ``_get_rules_version``) only keys the cache.
+        """
+        rules_by_prefix = {}
+        rules = self.sudo().search_fetch([], [
+            'sequence', 'dial_prefix', 'department', 'doctor_id', 'consultation_mode', 'amount', 'currency_id',
+        ])
+        for rule in rules:
+            criteria = (rule.department or None, rule.doctor_id.id or None, rule.consultation_mode or None)
+            specificity = sum(criterion is not None for criterion in criteria)
+            rules_by_prefix.setdefault(self._normalize_phone(rule.dial_prefix), []).append(
+                (-specificity, rule.sequence, rule.id, criteria, rule.amount, rule.currency_id.id))
+        index = {
+            prefix: tuple((criteria, amount, currency_id) for *_, criteria, amount, currency_id in sorted(prefix_rules))
+            for prefix, prefix_rules in rules_by_prefix.items()
+        }
+        return tuple(sorted({len(prefix) for prefix in index}, reverse=True)), index
+
+    @api.model
+    def _match_fee(self, phone, department, doctor_id, consultation_mode):
+        """Return ``(amount, currency_id)`` of the best rule for a booking, or ``None``."""
+        lengths, index = self._get_fee_index(self._get_rules_version())
+        number = self._normalize_phone(phone)
+        for length in lengths:
+            for (rule_department, rule_doctor, rule_mode), amount, currency_id in index.get(number[:length], ()):
+                if (rule_department in (None, department) and rule_doctor in (None, doctor_id)
+                        and rule_mode in (None, consultation_mode)):
+                    return amount, currency_id
+        return None
@@ -0,0 +1,191 @@
+import logging
+
+import psycopg2
+
+from odoo import api, fields, models
+from odoo.tools import escape_psql, sql
+
+_logger = logging.getLogger(__name__)
+
+
+class ResPartner(models.Model):
+    _inherit = 'res.partner'
+
+    patient_reference_id = fields.Char(
+        string="Patient Reference ID", copy=False, readonly=True,
+        help="Authoritative reference id of the patient, assigned on the first booking.",
+    )
+
+    # The unique index also serves the reference -> patient lookups
+    _sql_constraints = [
+        ('patient_reference_id_uniq', 'unique(patient_reference_id)', 'This Patient Reference ID is already assigned to another patient.'),
+    ]
+
+    # Default hard budget of one patient lookup, see consultations.patient_lookup_timeout_ms
+    LOOKUP_TIMEOUT_MS = 300
+
+    def init(self):
+        super().init()
+        self._create_trigram_indexes('res_partner', ['name', 'phone', 'email', 'patient_reference_id'])
+
+    @api.model
+    def _create_trigram_indexes(self, table, columns):
+        """Create a GIN trigram index on each of ``table.columns``, for ``ilike '%...%'`` searches."""
+        if not self.env.registry.has_trigram:
+            _logger.warning("⚠️ pg_trgm is not installed, %s is searched without trigram indexes", table)
+            return
+        for column in columns:
+            sql.create_index(self.env.cr, '%s_%s_trgm_idx' % (table, column), table,
+                             ['%s gin_trgm_ops' % column], method='gin')
+
+    @api.model
+    def lookup_patients(self, term, limit=20):
+        """Find patients by partial name, phone, email or reference id, best matches first.
+
+        Partners, appointment bookings and doctor appointments are searched
+        in one query on their trigram indexes. An exact reference id ranks
+        first, then prefix matches, then similar names. The query gets a
+        hard ``statement_timeout``; when it runs out, no result is returned
+        rather than a slow one.
+
+        :return: list of ``{'id', 'name', 'patient_reference_id', 'phone', 'email', 'score'}``
+        """
+        term = (term or '').strip()
+        if not term:
+            return []
+        # (table, patient column, searched columns, name column, reference column)
+        sources = [
+            ('res_partner', 'id', ('name', 'phone', 'email', 'patient_reference_id'), 'name', 'patient_reference_id'),
+            ('appointment_booking', 'patient_id', ('name', 'phone', 'email', 'reference_id'), 'name', 'reference_id'),
+        ]
+        if 'doctor.appointments' in self.env:
+            sources.append(('doctor_appointments', 'patient_id', ('reference_id',), None, 'reference_id'))
+
+        branches = []
+        for table, patient, columns, name, reference in sources:
+            similarity = 'similarity(%s, %%(term)s)' % name if name and self.env.registry.has_trigram else '0'
+            branches.append("""
+                (SELECT {patient} AS partner_id,
+                        CASE WHEN upper({reference}) = upper(%(term)s) THEN 3
+                             WHEN {prefix} THEN 2
+                             ELSE 1
+                        END + {similarity} AS score
+                   FROM {table}
+                  WHERE {patient} IS NOT NULL AND ({match})
+                  ORDER BY score DESC
+                  LIMIT %(limit)s)
+            """.format(
+                table=table, patient=patient, reference=reference, similarity=similarity,
+                prefix=' OR '.join('%s ILIKE %%(prefix)s' % column for column in columns),
+                match=' OR '.join('%s ILIKE %%(like)s' % column for column in columns),
+            ))
+        query = """
+            SELECT partner_id, MAX(score) AS score
+              FROM ({branches}) matches
+             GROUP BY partner_id
+             ORDER BY score DESC, partner_id
+             LIMIT %(limit)s
+        """.format(branches=' UNION ALL '.join(branches))
+        params = {
+            'term': term,
+            'prefix': escape_psql(term) + '%',
+            'like': '%' + escape_psql(term) + '%',
+            'limit': limit,
+        }
+
+        timeout = int(self.env['ir.config_parameter'].sudo().get_param(
+            'consultations.patient_lookup_timeout_ms', self.LOOKUP_TIMEOUT_MS))
+        self.flush_model(['name', 'phone', 'email', 'patient_reference_id'])
+        self.env['appointment.booking'].flush_model(['patient_id', 'name', 'phone', 'email', 'reference_id'])
+        cr = self.env.cr
+        cr.execute("SHOW statement_timeout")
+        previous_timeout = cr.fetchone()[0]
+        try:
+            with cr.savepoint():
+                cr.execute("SET LOCAL statement_timeout = %s", ['%dms' % timeout])
+                cr.execute(query, params)
+                scores = dict(cr.fetchall())
+        except psycopg2.errors.QueryCanceled:
+            _logger.warning("⚠️ Patient lookup for %r exceeded its %dms budget", term, timeout)
+            scores = {}
+        finally:
+            cr.execute("SET LOCAL statement_timeout = %s", [previous_timeout])
+
+        # Going through search() applies the access rules to the raw matches
+        partners = self.search_fetch([('id', 'in', list(scores))], ['name', 'patient_reference_id', 'phone', 'email'])
+        return sorted(({
+            'id': partner.id,
+            'name': partner.name,
+            'patient_reference_id': partner.patient_reference_id,
+            'phone': partner.phone,
+            'email': partner.email,
+            'score': round(scores[partner.id], 3),
+        } for partner in partners), key=lambda match: (-match['score'], match['id']))
+
+    @api.model
+    def _find_by_patient_reference(self, reference):
+        """Return the patient owning ``reference`` (exact match on the unique index)."""
+        reference = (reference or '').strip()
+        if not reference:
+            return self.browse()
+        return self.search([('patient_reference_id', '=', reference)], limit=1)
+
+    @api.model
+    def name_search(self, name='', domain=None, operator='ilike', limit=100):
+        # Front-desk search by scanned or typed reference id: one index probe before the fuzzy search
+        if name and operator in ('ilike', '=', '=ilike'):
+            partner = self._find_by_patient_reference(name)
+            if partner and partner.filtered_domain(domain or []):
+                return [(partner.id, partner.display_name)]
+        return super().name_search(name, domain, operator, limit)
+
+    def _get_patient_reference_ids(self, generate, proposed=None):
+        """Return ``{partner_id: patient_reference_id}`` for ``self``, registering missing ones.
+
+        Partners without a reference get ``proposed[partner_id]`` when given
+        and still free, else ``generate(partner_id)``. All of them are
+        written with one UPDATE; if another transaction registers the same
+        reference first, the registrations are read again and retried once.
+        """
+        proposed = proposed or {}
+        partners = self.with_context(active_test=False)
+        for attempt in range(2):
+            references = {partner.id: partner.patient_reference_id for partner in partners}
+            wanted = {pid: proposed.get(pid) or generate(pid) for pid, reference in references.items() if not reference}
+            if not wanted:
+                return references
+
+            taken = set(partners.search([
+                ('patient_reference_id', 'in', list(set(wanted.values()))),
+            ]).mapped('patient_reference_id'))
+            new_references = {}
+            for partner_id, reference in wanted.items():
+                if reference in taken:
+                    # The proposed reference already belongs to another patient
+                    reference = generate(partner_id)
+                if reference not in taken:
+                    new_references[partner_id] = reference
+                    taken.add(reference)
+            try:
+                with self.env.cr.savepoint():
+                    partners._register_patient_references(new_references)
+            except psycopg2.errors.UniqueViolation:
+                if attempt:
+                    raise
+                _logger.warning("⚠️ Patient reference id registered concurrently, retrying")
+            partners.invalidate_recordset(['patient_reference_id'])
+        return {partner.id: partner.patient_reference_id for partner in partners}
+
+    def _register_patient_references(self, references):
+        """Store ``{partner_id: reference}`` on partners that have none yet, with one UPDATE."""
+        if not references:
+            return
+        self.flush_model(['patient_reference_id'])
+        self.env.cr.execute("""
+            UPDATE res_partner partner
+               SET patient_reference_id = new.reference
+              FROM (VALUES %s) AS new (id, reference)
+             WHERE partner.id = new.id
+               AND partner.patient_reference_id IS NULL
+        """ % ', '.join(['(%s, %s)'] * len(references)),
+            [value for item in references.items() for value in item])
@@ -0,0 +1,628 @@
+import csv
+import io
+import logging
+import os
+import threading
+import time
+from collections import deque
+from itertools import islice
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+from odoo.tools import config
+
+_logger = logging.getLogger(__name__)
+
+# Source columns of each kind of file, matched case-insensitively against the CSV header.
+# Bookings and appointments are keyed on (reference_id, appointment_date), prescriptions
+# on the appointment with that key and the medicine name.
+MIGRATION_COLUMNS = {
+    'booking': (
+        'reference_id', 'appointment_date', 'patient_name', 'phone', 'email', 'gender', 'date_of_birth',
+        'op_number', 'department', 'doctor', 'consultation_mode', 'state',
+    ),
+    'appointment': (
+        'reference_id', 'appointment_date', 'patient_name', 'phone', 'email', 'op_number', 'doctor',
+        'consultation_mode', 'state', 'chief_complaint', 'associated_complaint', 'past_history',
+        'family_history', 'present_history', 'diagnosis', 'investigations', 'others', 'panchakarma_advice',
+        'artava', 'nadi', 'agni', 'mala', 'mutra', 'nidra', 'manas', 'htn', 'dm', 'th',
+        'prescribed_details', 'new_compound', 'ingredients', 'diet', 'special_note',
+    ),
+    'prescription': (
+        'reference_id', 'appointment_date', 'medicine', 'dosage', 'usage', 'days', 'course', 'quantity',
+    ),
+}
+# Free-text doctor.appointments columns copied as they are
+APPOINTMENT_TEXT_COLUMNS = (
+    'chief_complaint', 'associated_complaint', 'past_history', 'family_history', 'present_history',
+    'diagnosis', 'investigations', 'others', 'panchakarma_advice', 'artava', 'nadi', 'agni', 'mala',
+    'mutra', 'nidra', 'manas', 'prescribed_details', 'new_compound', 'ingredients', 'special_note',
+)
+# Accepted date formats: YYYY-MM-DD, DD-MM-YYYY and DD/MM/YYYY. Impossible dates
+# (31-02-2020, 2020-13-45) give NULL instead of an error, so their rows are skipped.
+DATE_SQL = """(SELECT make_date(parts.y, parts.m, parts.d)
+   FROM (SELECT COALESCE(iso[1], dmy[3])::integer AS y, COALESCE(iso[2], dmy[2])::integer AS m,
+                COALESCE(iso[3], dmy[1])::integer AS d
+           FROM regexp_match(trim({0}), '^(\\d{{4}})-(\\d{{1,2}})-(\\d{{1,2}})$') iso,
+                regexp_match(trim({0}), '^(\\d{{1,2}})[-/](\\d{{1,2}})[-/](\\d{{4}})$') dmy) parts
+  WHERE parts.d BETWEEN 1 AND CASE WHEN parts.y BETWEEN 1 AND 9999 AND parts.m BETWEEN 1 AND 12
+            THEN extract(day FROM make_date(parts.y, parts.m, 1) + interval '1 month - 1 day') END)"""
+# Positive integers, anything else falls back to 1
+COUNT_SQL = "CASE WHEN trim({0}) ~ '^\\d{{1,6}}$' THEN GREATEST(trim({0})::integer, 1) ELSE 1 END"
+# Selection values are matched case-insensitively, unknown ones are dropped
+SELECTION_SQL = "CASE WHEN lower(trim({0})) = ANY(%({1})s) THEN lower(trim({0})) END"
+
+
+class ConsultationMigrationJob(models.Model):
+    """Resumable bulk load of the legacy clinic history from CSV files.
+
+    The file is streamed in chunks of ``chunk_size`` rows. Each chunk is
+    copied into a temporary staging table, deduplicated on its key (the
+    last row wins) and applied to ``appointment.booking``,
+    ``doctor.appointments`` or ``doctor.medicine.lines`` with one UPDATE
+    and one INSERT per table. Patients, doctors, medicines and dosages
+    missing from the database are created once per chunk.
+
+    The transaction is committed after every chunk together with the
+    ``rows_done`` checkpoint, so a failed or interrupted job resumes after
+    the last loaded chunk. Rows are matched on the data they carry, so
+    reloading a chunk updates the records instead of duplicating them.
+    """
+    _name = 'consultation.migration.job'
+    _description = 'Legacy Data Migration Job'
+    _order = 'id desc'
+
+    name = fields.Char(string="Name", required=True)
+    kind = fields.Selection([
+        ('booking', 'Appointment Bookings'),
+        ('appointment', 'Doctor Appointments'),
+        ('prescription', 'Prescriptions'),
+    ], string="Data", required=True, default='booking')
+    data_file = fields.Binary(string="CSV File", attachment=True)
+    data_filename = fields.Char(string="File Name")
+    source_path = fields.Char(string="Server File Path",
+                              help="CSV file on the server, for files too large to upload. Used when no file is uploaded.")
+    chunk_size = fields.Integer(string="Rows per Chunk", default=5000)
+    state = fields.Selection([
+        ('draft', 'Draft'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ], string="Status", default='draft', required=True, readonly=True, copy=False)
+    rows_done = fields.Integer(string="Rows Processed", readonly=True, copy=False,
+                               help="Checkpoint: source rows already committed. The job resumes after them.")
+    rows_loaded = fields.Integer(string="Rows Loaded", readonly=True, copy=False)
+    rows_skipped = fields.Integer(string="Rows Skipped", readonly=True, copy=False,
+                                  help="Rows without a usable key and duplicates superseded within their chunk.")
+    chunks_done = fields.Integer(string="Chunks", readonly=True, copy=False)
+    load_time = fields.Float(string="Load Time (s)", readonly=True, copy=False)
+    started_at = fields.Datetime(string="Started", readonly=True, copy=False)
+    finished_at = fields.Datetime(string="Finished", readonly=True, copy=False)
+    last_error = fields.Text(string="Last Error", readonly=True, copy=False)
+
+    # Seconds one cron run keeps loading before handing over to the next run, at most
+    TIME_BUDGET = 1800
+    # Seconds left before the cron worker's time limit to finish and commit the current chunk
+    TIME_MARGIN = 30
+
+    def action_start(self):
+        """Start or resume the jobs in the background, from their last checkpoint."""
+        for job in self:
+            if not job.data_file and not job.source_path:
+                raise UserError(_("Upload a CSV file or give its path on the server for %s.", job.name))
+        self.write({'state': 'running', 'last_error': False})
+        self._trigger_cron()
+
+    def action_reset(self):
+        """Forget the checkpoint so the next run reloads the file from its first row."""
+        self.write({
+            'state': 'draft', 'rows_done': 0, 'rows_loaded': 0, 'rows_skipped': 0, 'chunks_done': 0,
+            'load_time': 0.0, 'started_at': False, 'finished_at': False, 'last_error': False,
+        })
+
+    def _trigger_cron(self):
+        cron = self.env.ref('consultations.ir_cron_migration_jobs', raise_if_not_found=False)
+        if cron:
+            cron._trigger()
+
+    def _commit_chunk(self):
+        if not getattr(threading.current_thread(), 'testing', False):
+            self.env.cr.commit()
+
+    def _rollback_chunk(self):
+        if not getattr(threading.current_thread(), 'testing', False):
+            self.env.cr.rollback()
+        self.env.invalidate_all(flush=False)
+
+    @api.model
+    def _time_budget(self):
+        """Return the seconds a cron run may load, ending before the worker's real time limit kills it."""
+        limit = config.get('limit_time_real_cron', -1)
+        if limit is None or limit < 0:
+            # -1: crons share the limit of the other workers
+            limit = config.get('limit_time_real', 0)
+        if not limit or limit < 0:
+            # No time limit
+            return self.TIME_BUDGET
+        return min(self.TIME_BUDGET, max(limit - self.TIME_MARGIN, limit / 2))
+
+    @api.model
+    def _cron_run_jobs(self):
+        """Load the running jobs, chunk by chunk, within the cron time budget."""
+        deadline = time.monotonic() + self._time_budget()
+        for job in self.search([('state', '=', 'running')], order='id'):
+            try:
+                job._run(deadline)
+            except Exception as e:
+                # Keep the chunks committed so far and fail this job only, so it cannot block the others
+                if not isinstance(e, UserError):
+                    _logger.exception("❌ Migration job %s failed", job.name)
+                self._rollback_chunk()
+                job.write({'state': 'failed', 'last_error': str(e)})
+                self._commit_chunk()
+            if time.monotonic() >= deadline:
+                # Out of time: continue in a fresh run
+                self._trigger_cron()
+                break
+
+    def _run(self, deadline=None):
+        """Load the file from the checkpoint onwards, committing after each chunk."""
+        self.ensure_one()
+        if self.kind != 'booking' and 'doctor.appointments' not in self.env:
+            raise UserError(_("Loading %s requires the Doctor Home module.", self.kind))
+        self.write({'state': 'running', 'started_at': self.started_at or fields.Datetime.now()})
+        columns = MIGRATION_COLUMNS[self.kind]
+
+        with self._open_source() as stream:
+            reader = csv.reader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+            header = [name.strip().lower() for name in next(reader, [])]
+            positions = [header.index(column) if column in header else None for column in columns]
+            if None in positions[:2]:
+                raise UserError(_("The file needs reference_id and appointment_date columns."))
+            # Skip the rows committed by previous runs
+            deque(islice(reader, self.rows_done), maxlen=0)
+
+            while not deadline or time.monotonic() < deadline:
+                rows = list(islice(reader, max(self.chunk_size, 1)))
+                if not rows:
+                    self.write({'state': 'done', 'finished_at': fields.Datetime.now()})
+                    self._commit_chunk()
+                    _logger.info("✅ Migration job %s done: %d rows loaded, %d skipped in %.1fs.",
+                                 self.name, self.rows_loaded, self.rows_skipped, self.load_time)
+                    return
+
+                start = time.perf_counter()
+                try:
+                    with self.env.cr.savepoint():
+                        loaded = self._load_chunk([
+                            [row[position] if position is not None and position < len(row) else ''
+                             for position in positions]
+                            for row in rows
+                        ])
+                except Exception as e:
+                    _logger.exception("❌ Migration job %s failed after row %d", self.name, self.rows_done)
+                    self.env.invalidate_all()
+                    self.write({'state': 'failed', 'last_error': str(e)})
+                    self._commit_chunk()
+                    return
+
+                elapsed = time.perf_counter() - start
+                self.write({
+                    'rows_done': self.rows_done + len(rows),
+                    'rows_loaded': self.rows_loaded + loaded,
+                    'rows_skipped': self.rows_skipped + len(rows) - loaded,
+                    'chunks_done': self.chunks_done + 1,
+                    'load_time': self.load_time + elapsed,
+                })
+                self._commit_chunk()
+                # Keep the cache, and so memory, bounded across chunks
+                self.env.invalidate_all()
+                _logger.info("📦 Migration job %s: chunk %d, %d/%d rows loaded in %.2fs (%d rows done).",
+                             self.name, self.chunks_done, loaded, len(rows), elapsed, self.rows_done)
+
+    def _open_source(self):
+        """Open the uploaded file, or the server file, as a binary stream."""
+        if self.data_file:
+            attachment = self.env['ir.attachment'].sudo().search([
+                ('res_model', '=', self._name), ('res_field', '=', 'data_file'), ('res_id', '=', self.id),
+            ], limit=1)
+            if attachment.store_fname:
+                # Stream from the filestore instead of loading the whole file in memory
+                return open(attachment._full_path(attachment.store_fname), 'rb')
+            return io.BytesIO(attachment.raw or b'')
+        if not os.path.isfile(self.source_path or ''):
+            raise UserError(_("File %s not found on the server.", self.source_path))
+        return open(self.source_path, 'rb')
+
+    def _load_chunk(self, rows):
+        """Stage ``rows`` and apply them; return the number of rows loaded."""
+        self._stage(rows)
+        return getattr(self, '_load_%s_chunk' % self.kind)()
+
+    def _stage(self, rows):
+        """Copy ``rows`` into ``migration_rows``, typed, keyed and deduplicated."""
+        cr = self.env.cr
+        columns = MIGRATION_COLUMNS[self.kind]
+        cr.execute("DROP TABLE IF EXISTS migration_stage, migration_rows")
+        cr.execute("CREATE TEMP TABLE migration_stage (line integer, %s) ON COMMIT DROP"
+                   % ', '.join('%s text' % column for column in columns))
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for line, row in enumerate(rows, self.rows_done + 2):
+            # Empty values are written unquoted and so loaded as NULL
+            writer.writerow([line] + [value.replace('\x00', '').strip() for value in row])
+        buffer.seek(0)
+        cr.copy_expert("COPY migration_stage FROM STDIN WITH (FORMAT csv)", buffer)
+
+        key = "stage.reference_id, %s" % DATE_SQL.format('stage.appointment_date')
+        if self.kind == 'prescription':
+            key += ", stage.medicine"
+        cr.execute("""
+            CREATE TEMP TABLE migration_rows ON COMMIT DROP AS
+            SELECT DISTINCT ON ({key}) stage.*, {date} AS visit_date
+              FROM migration_stage stage
+             WHERE stage.reference_id IS NOT NULL
+               AND {date} IS NOT NULL
+               {extra}
+             ORDER BY {key}, stage.line DESC
+        """.format(
+            key=key,
+            date=DATE_SQL.format('stage.appointment_date'),
+            extra="AND stage.medicine IS NOT NULL" if self.kind == 'prescription' else "",
+        ))
+
+    def _selection_params(self, model_name, *field_names):
+        """Return ``{field_name: [selection keys]}`` for SELECTION_SQL."""
+        model_fields = self.env[model_name]._fields
+        return {name: [key for key, _label in model_fields[name]._description_selection(self.env)]
+                for name in field_names}
+
+    def _resolve_names(self, table, name_column, source_column, target_column):
+        """Create the ``table`` records named in ``source_column`` that do not exist yet,
+        then store their ids in ``migration_rows.target_column``."""
+        cr = self.env.cr
+        cr.execute("""
+            INSERT INTO {table} ({name}, create_uid, create_date, write_uid, write_date)
+            SELECT DISTINCT rows.{source}, %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+              FROM migration_rows rows
+             WHERE rows.{source} IS NOT NULL
+               AND NOT EXISTS (SELECT 1 FROM {table} existing WHERE existing.{name} = rows.{source})
+        """.format(table=table, name=name_column, source=source_column), {'uid': self.env.uid})
+        cr.execute("""
+            ALTER TABLE migration_rows ADD COLUMN {target} integer;
+            UPDATE migration_rows rows
+               SET {target} = (SELECT MIN(existing.id) FROM {table} existing WHERE existing.{name} = rows.{source})
+             WHERE rows.{source} IS NOT NULL
+        """.format(table=table, name=name_column, source=source_column, target=target_column))
+
+    def _resolve_patients(self):
+        """Find the patients of ``migration_rows`` by reference id, creating the missing ones."""
+        cr = self.env.cr
+        Partner = self.env['res.partner']
+        Partner.flush_model(['patient_reference_id'])
+        cr.execute("""
+            SELECT DISTINCT ON (rows.reference_id) rows.reference_id, rows.patient_name, rows.phone, rows.email
+              FROM migration_rows rows
+             WHERE NOT EXISTS (SELECT 1 FROM res_partner partner WHERE partner.patient_reference_id = rows.reference_id)
+             ORDER BY rows.reference_id, rows.line DESC
+        """)
+        missing = cr.fetchall()
+        if missing:
+            partners = Partner.create([{
+                'name': name or reference,
+                'phone': phone,
+                'email': email,
+            } for reference, name, phone, email in missing])
+            partners._register_patient_references({
+                partner.id: reference for partner, (reference, *_values) in zip(partners, missing)
+            })
+        cr.execute("""
+            ALTER TABLE migration_rows ADD COLUMN patient_id integer;
+            UPDATE migration_rows rows
+               SET patient_id = partner.id
+              FROM res_partner partner
+             WHERE partner.patient_reference_id = rows.reference_id
+        """)
+
+    def _recompute(self, records, field_names):
+        """Recompute stored fields of ``records`` written behind the ORM's back."""
+        self.env.invalidate_all()
+        for name in field_names:
+            self.env.add_to_compute(records._fields[name], records)
+        records.flush_recordset()
+
+    def _load_booking_chunk(self):
+        cr = self.env.cr
+        Booking = self.env['appointment.booking']
+        Booking.flush_model()
+        self._resolve_patients()
+        self._resolve_names('consultation_doctor', 'name', 'doctor', 'doctor_id')
+        params = dict(
+            self._selection_params('appointment.booking', 'gender', 'department', 'consultation_mode', 'state'),
+            uid=self.env.uid,
+        )
+        values = {
+            'gender': SELECTION_SQL.format('rows.gender', 'gender'),
+            'date_of_birth': DATE_SQL.format('rows.date_of_birth'),
+            'department': SELECTION_SQL.format('rows.department', 'department'),
+            'consultation_mode': SELECTION_SQL.format('rows.consultation_mode', 'consultation_mode'),
+            'state': SELECTION_SQL.format('rows.state', 'state'),
+            'phone': 'rows.phone',
+            'email': 'rows.email',
+            'op_number': 'rows.op_number',
+            'consultation_doctor': 'rows.doctor_id',
+        }
+
+        cr.execute("""
+            UPDATE appointment_booking booking
+               SET name = COALESCE(rows.patient_name, booking.name),
+                   {updates},
+                   write_uid = %(uid)s,
+                   write_date = NOW() AT TIME ZONE 'UTC'
+              FROM migration_rows rows
+             WHERE booking.reference_id = rows.reference_id
+               AND booking.appointment_date = rows.visit_date
+         RETURNING booking.id
+        """.format(updates=',\n'.join(
+            '{0} = COALESCE({1}, booking.{0})'.format(column, value) for column, value in values.items()
+        )), params)
+        updated_ids = [row[0] for row in cr.fetchall()]
+
+        cr.execute("""
+            INSERT INTO appointment_booking (
+                patient_id, name, reference_id, appointment_date, {columns},
+                create_uid, create_date, write_uid, write_date
+            )
+            SELECT rows.patient_id, COALESCE(rows.patient_name, partner.name), rows.reference_id, rows.visit_date,
+                   {values},
+                   %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+              FROM migration_rows rows
+              JOIN res_partner partner ON partner.id = rows.patient_id
+             WHERE NOT EXISTS (
+                   SELECT 1 FROM appointment_booking booking
+                    WHERE booking.reference_id = rows.reference_id AND booking.appointment_date = rows.visit_date
+             )
+         RETURNING id
+        """.format(
+            columns=', '.join(values),
+            values=', '.join("COALESCE(%s, 'booked')" % value if column == 'state' else value
+                             for column, value in values.items()),
+        ), params)
+        created_ids = [row[0] for row in cr.fetchall()]
+
+        # OP numbers for the new bookings the file has none for, in date order
+        cr.execute("""
+            SELECT id FROM appointment_booking
+             WHERE id = ANY(%s) AND op_number IS NULL
+             ORDER BY appointment_date, id
+        """, [created_ids])
+        missing_op = [row[0] for row in cr.fetchall()]
+        if missing_op:
+            numbers = Booking._reserve_op_numbers(len(missing_op))
+            cr.execute("""
+                UPDATE appointment_booking booking SET op_number = new.op_number
+                  FROM (VALUES %s) AS new (id, op_number)
+                 WHERE booking.id = new.id
+            """ % ', '.join(['(%s, %s)'] * len(missing_op)),
+                [value for pair in zip(missing_op, numbers) for value in pair])
+
+        if 'doctor.appointments' in self.env:
+            self._link_doctor_appointments(created_ids)
+
+        cr.execute("INSERT INTO appointment_daily_load_dirty (day) SELECT DISTINCT visit_date FROM migration_rows")
+        cr.execute("SELECT DISTINCT patient_id FROM migration_rows")
+        self.env['appointment.patient.stats']._refresh_patients([row[0] for row in cr.fetchall()])
+        self._recompute(Booking.browse(updated_ids + created_ids),
+                        ['age', 'payment', 'payment_currency_id', 'patient_type'])
+        return self._count_rows()
+
+    def _count_rows(self):
+        self.env.cr.execute("SELECT COUNT(*) FROM migration_rows")
+        return self.env.cr.fetchone()[0]
+
+    def _link_doctor_appointments(self, booking_ids):
+        """Attach the new bookings to their doctor appointment, creating the missing ones."""
+        if not booking_ids:
+            return
+        cr = self.env.cr
+        self.env['doctor.appointments'].flush_model()
+        params = {'ids': booking_ids, 'uid': self.env.uid}
+        cr.execute("""
+            UPDATE doctor_appointments appointment
+               SET booking_id = booking.id
+              FROM appointment_booking booking
+             WHERE booking.id = ANY(%(ids)s)
+               AND appointment.reference_id = booking.reference_id
+               AND appointment.appointment_date = booking.appointment_date
+               AND appointment.booking_id IS NULL
+        """, params)
+        cr.execute("""
+            INSERT INTO doctor_appointments (
+                booking_id, patient_id, reference_id, op_number, appointment_date, consultation_doctor,
+                consultation_mode, state, htn, dm, th, create_uid, create_date, write_uid, write_date
+            )
+            SELECT DISTINCT ON (booking.reference_id, booking.appointment_date)
+                   booking.id, booking.patient_id, booking.reference_id, booking.op_number, booking.appointment_date,
+                   booking.consultation_doctor, COALESCE(booking.consultation_mode, 'offline'), booking.state,
+                   NULL, NULL, NULL,
+                   %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+              FROM appointment_booking booking
+             WHERE booking.id = ANY(%(ids)s)
+               AND NOT EXISTS (
+                   SELECT 1 FROM doctor_appointments appointment
+                    WHERE appointment.reference_id = booking.reference_id
+                      AND appointment.appointment_date = booking.appointment_date
+             )
+             -- One appointment per visit, as the (reference_id, appointment_date) constraint requires
+             ORDER BY booking.reference_id, booking.appointment_date, booking.id
+         RETURNING id
+        """, params)
+        created = self.env['doctor.appointments'].browse(row[0] for row in cr.fetchall())
+        created._invalidate_history_cache()
+        self._fill_vitals(created.ids)
+        cr.execute("""
+            UPDATE appointment_booking booking
+               SET doctor_appointment_id = appointment.id
+              FROM doctor_appointments appointment
+             WHERE booking.id = ANY(%(ids)s)
+               AND appointment.booking_id = booking.id
+        """, params)
+        self._recompute(created, ['patient_type', 'history_entry'])
+
+    def _load_appointment_chunk(self):
+        cr = self.env.cr
+        Appointment = self.env['doctor.appointments']
+        Appointment.flush_model()
+        self._resolve_patients()
+        self._resolve_names('consultation_doctor', 'name', 'doctor', 'doctor_id')
+        params = dict(
+            self._selection_params('doctor.appointments', 'consultation_mode', 'state', 'diet'),
+            uid=self.env.uid,
+        )
+        values = dict(
+            {column: 'rows.%s' % column for column in APPOINTMENT_TEXT_COLUMNS + ('op_number', 'htn', 'dm', 'th')},
+            consultation_doctor='rows.doctor_id',
+            consultation_mode=SELECTION_SQL.format('rows.consultation_mode', 'consultation_mode'),
+            state=SELECTION_SQL.format('rows.state', 'state'),
+            diet=SELECTION_SQL.format('rows.diet', 'diet'),
+        )
+        # Missing vitals are taken from the patient's vitals history afterwards
+        defaults = {'consultation_mode': 'offline', 'state': 'completed'}
+        has_vitals = "(rows.htn IS NOT NULL OR rows.dm IS NOT NULL OR rows.th IS NOT NULL)"
+
+        cr.execute("""
+            UPDATE doctor_appointments appointment
+               SET {updates},
+                   write_uid = %(uid)s,
+                   write_date = NOW() AT TIME ZONE 'UTC'
+              FROM migration_rows rows
+             WHERE appointment.reference_id = rows.reference_id
+               AND appointment.appointment_date = rows.visit_date
+         RETURNING appointment.id, {has_vitals}
+        """.format(has_vitals=has_vitals, updates=',\n'.join(
+            '{0} = COALESCE({1}, appointment.{0})'.format(column, value) for column, value in values.items()
+        )), params)
+        updated = cr.fetchall()
+
+        cr.execute("""
+            INSERT INTO doctor_appointments (
+                patient_id, reference_id, appointment_date, booking_id, {columns},
+                create_uid, create_date, write_uid, write_date
+            )
+            SELECT rows.patient_id, rows.reference_id, rows.visit_date,
+                   (SELECT MIN(booking.id) FROM appointment_booking booking
+                     WHERE booking.reference_id = rows.reference_id AND booking.appointment_date = rows.visit_date),
+                   {values},
+                   %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+              FROM migration_rows rows
+             WHERE NOT EXISTS (
+                   SELECT 1 FROM doctor_appointments appointment
+                    WHERE appointment.reference_id = rows.reference_id AND appointment.appointment_date = rows.visit_date
+             )
+         RETURNING id, booking_id, {has_vitals}
+        """.format(
+            has_vitals=has_vitals.replace('rows.', ''),
+            columns=', '.join(values),
+            values=', '.join("COALESCE(%s, '%s')" % (value, defaults[column]) if column in defaults else value
+                             for column, value in values.items()),
+        ), params)
+        created = cr.fetchall()
+        linked = [(booking_id, appointment_id) for appointment_id, booking_id, _vitals in created if booking_id]
+        if linked:
+            cr.execute("""
+                UPDATE appointment_booking booking SET doctor_appointment_id = new.appointment_id
+                  FROM (VALUES %s) AS new (id, appointment_id)
+                 WHERE booking.id = new.id AND booking.doctor_appointment_id IS NULL
+            """ % ', '.join(['(%s, %s)'] * len(linked)), [value for pair in linked for value in pair])
+
+        loaded_ids = [row[0] for row in updated] + [row[0] for row in created]
+        Appointment._invalidate_history_cache()
+        self._recompute(Appointment.browse(loaded_ids), ['patient_type', 'history_entry'])
+        self._fill_vitals([row[0] for row in created])
+        # Vitals given in the file are what the doctor recorded for that visit
+        self.env['doctor.patient.vitals']._record([row[0] for row in updated + created if row[-1]], force=True)
+        return self._count_rows()
+
+    def _fill_vitals(self, appointment_ids):
+        """Give the vitals missing on ``appointment_ids`` the values of the patient's latest snapshot."""
+        if not appointment_ids:
+            return
+        self.env.invalidate_all()
+        appointments = self.env['doctor.appointments'].browse(appointment_ids)
+        vitals = self.env['doctor.patient.vitals']._get_vitals(appointments)
+        if not vitals:
+            return
+        self.env.cr.execute("""
+            UPDATE doctor_appointments appointment
+               SET htn = COALESCE(appointment.htn, snapshot.htn),
+                   dm = COALESCE(appointment.dm, snapshot.dm),
+                   th = COALESCE(appointment.th, snapshot.th)
+              FROM unnest(%s::int[], %s::varchar[], %s::varchar[], %s::varchar[]) AS snapshot (id, htn, dm, th)
+             WHERE appointment.id = snapshot.id
+        """, [
+            [appointment.id for appointment in vitals],
+            [values['htn'] for values in vitals.values()],
+            [values['dm'] for values in vitals.values()],
+            [values['th'] for values in vitals.values()],
+        ])
+        appointments.invalidate_recordset(['htn', 'dm', 'th'])
+
+    def _load_prescription_chunk(self):
+        cr = self.env.cr
+        self.env['doctor.medicine.lines'].flush_model()
+        self.env['doctor.appointments'].flush_model()
+        cr.execute("""
+            ALTER TABLE migration_rows ADD COLUMN appointment_id integer;
+            UPDATE migration_rows rows
+               SET appointment_id = (
+                   SELECT MIN(appointment.id) FROM doctor_appointments appointment
+                    WHERE appointment.reference_id = rows.reference_id AND appointment.appointment_date = rows.visit_date
+               );
+            DELETE FROM migration_rows WHERE appointment_id IS NULL;
+        """)
+        self._resolve_names('doctor_medicines', 'medicine_name', 'medicine', 'medicine_id')
+        self._resolve_names('doctor_dosages', 'dosage', 'dosage', 'dosage_id')
+        # Same medicine under the same appointment through another reference id: keep one line
+        cr.execute("""
+            DELETE FROM migration_rows rows
+             USING migration_rows other
+             WHERE other.appointment_id = rows.appointment_id
+               AND other.medicine_id = rows.medicine_id
+               AND other.line > rows.line
+        """)
+        params = dict(self._selection_params('doctor.medicine.lines', 'course'), uid=self.env.uid)
+        values = {
+            'dosage_id': 'rows.dosage_id',
+            'usage': 'rows.usage',
+            'days': COUNT_SQL.format('rows.days'),
+            'course': SELECTION_SQL.format('rows.course', 'course'),
+            'quantity': COUNT_SQL.format('rows.quantity'),
+        }
+
+        cr.execute("""
+            UPDATE doctor_medicine_lines line
+               SET {updates},
+                   write_uid = %(uid)s,
+                   write_date = NOW() AT TIME ZONE 'UTC'
+              FROM migration_rows rows
+             WHERE line.appointment_id = rows.appointment_id
+               AND line.medicine_id = rows.medicine_id
+        """.format(updates=',\n'.join(
+            '{0} = COALESCE({1}, line.{0})'.format(column, value) for column, value in values.items()
+        )), params)
+        cr.execute("""
+            INSERT INTO doctor_medicine_lines (
+                appointment_id, medicine_id, reference_id, prescription_date, {columns},
+                create_uid, create_date, write_uid, write_date
+            )
+            SELECT rows.appointment_id, rows.medicine_id, rows.reference_id, rows.visit_date, {values},
+                   %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+              FROM migration_rows rows
+             WHERE NOT EXISTS (
+                   SELECT 1 FROM doctor_medicine_lines line
+                    WHERE line.appointment_id = rows.appointment_id AND line.medicine_id = rows.medicine_id
+             )
+        """.format(columns=', '.join(values), values=', '.join(values.values())), params)
+        self.env.invalidate_all()
+        return self._count_rows()
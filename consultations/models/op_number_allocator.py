@@ -0,0 +1,102 @@
+import logging
+import threading
+from collections import deque
+
+from odoo import api, models
+
+_logger = logging.getLogger(__name__)
+
+
+class OpNumberAllocator(models.AbstractModel):
+    """Hand out OP numbers from blocks reserved per worker process.
+
+    Each worker reserves ``consultations.op_number_block_size`` numbers
+    (default 50) of the ``appointment.op_number`` sequence with a single
+    ``nextval()`` statement and serves bookings from that block in memory,
+    so concurrent registrations only meet in PostgreSQL once per block.
+    Numbers keep the sequence's ``EA-`` prefix and padding.
+
+    Guarantees:
+
+    * Unique: every number comes from ``nextval()``, which never returns the
+      same value twice, whatever the transaction outcome.
+    * Increasing per worker only: numbers are handed out in order within a
+      block, but workers serve their blocks in parallel, so across workers
+      a later booking can get a lower number.
+    * Gaps are possible: numbers of a rolled back booking are not reused,
+      and the unused rest of a block is lost when a worker restarts.
+      Restarting the sequence (changing its next number) requires
+      restarting the workers, which may still hold numbers from before.
+
+    Sequences configured as "No gap" or with date ranges are not cached:
+    their numbers are transactional, so each batch draws exactly the
+    numbers it needs, in one step for "No gap" sequences.
+    """
+    _name = 'appointment.op.number.allocator'
+    _description = 'OP Number Allocator'
+
+    SEQUENCE_CODE = 'appointment.op_number'
+    DEFAULT_BLOCK_SIZE = 50
+
+    # {(dbname, sequence id): deque of reserved numbers}, shared by the threads of a worker
+    _blocks = {}
+    _blocks_lock = threading.Lock()
+
+    @api.model
+    def _get_sequence(self):
+        return self.env['ir.sequence'].sudo().search([
+            ('code', '=', self.SEQUENCE_CODE),
+            ('company_id', 'in', [self.env.company.id, False]),
+        ], order='company_id', limit=1)
+
+    @api.model
+    def allocate(self, count=1):
+        """Return ``count`` new formatted OP numbers."""
+        if count <= 0:
+            return []
+        sequence = self._get_sequence()
+        if not sequence:
+            return ['0000'] * count
+        if sequence.use_date_range:
+            return [sequence._next() for _i in range(count)]
+        if sequence.implementation == 'no_gap':
+            numbers = self._reserve_no_gap(sequence, count)
+        else:
+            numbers = self._take_from_blocks(sequence, count)
+        return [sequence.get_next_char(number) for number in numbers]
+
+    @api.model
+    def _take_from_blocks(self, sequence, count):
+        key = (self.env.cr.dbname, sequence.id)
+        with self._blocks_lock:
+            block = self._blocks.setdefault(key, deque())
+            if len(block) < count:
+                block_size = int(self.env['ir.config_parameter'].sudo().get_param(
+                    'consultations.op_number_block_size', self.DEFAULT_BLOCK_SIZE))
+                block.extend(self._reserve_standard(sequence, max(block_size, count - len(block))))
+            return [block.popleft() for _i in range(count)]
+
+    @api.model
+    def _reserve_standard(self, sequence, count):
+        """Draw ``count`` numbers from the PostgreSQL sequence behind ``sequence`` in one statement."""
+        self.env.cr.execute(
+            "SELECT nextval(%s) FROM generate_series(1, %s)",
+            ['ir_sequence_%03d' % sequence.id, count],
+        )
+        numbers = sorted(row[0] for row in self.env.cr.fetchall())
+        _logger.debug("Reserved OP numbers %s-%s.", numbers[0], numbers[-1])
+        return numbers
+
+    @api.model
+    def _reserve_no_gap(self, sequence, count):
+        """Advance a "No gap" sequence by ``count`` with one row update, inside the current transaction."""
+        sequence.flush_recordset(['number_next'])
+        self.env.cr.execute("""
+            UPDATE ir_sequence
+               SET number_next = number_next + number_increment * %s
+             WHERE id = %s
+         RETURNING number_next - number_increment * %s, number_increment
+        """, [count, sequence.id, count])
+        first, increment = self.env.cr.fetchone()
+        sequence.invalidate_recordset(['number_next'])
+        return [first + index * increment for index in range(count)]
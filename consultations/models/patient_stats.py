@@ -0,0 +1,153 @@
+from odoo import api, fields, models
+
+
+class AppointmentPatientStats(models.Model):
+    """Per-patient visit summary, maintained incrementally by appointment.booking.
+
+    Creating bookings folds them into the existing row with one upsert;
+    cancelling, re-dating or deleting bookings recomputes only the affected
+    patients. Cancelled bookings do not count as visits, but still count
+    for ``first_booking_id`` (which drives new/old patient type) and
+    ``last_reference_id`` (the reference of the latest booking carrying one).
+    """
+    _name = 'appointment.patient.stats'
+    _description = 'Patient Visit Statistics'
+    _rec_name = 'patient_id'
+
+    patient_id = fields.Many2one('res.partner', string="Patient", required=True, ondelete='cascade')
+    visit_count = fields.Integer(string="Visits")
+    first_visit = fields.Date(string="First Visit")
+    last_visit = fields.Date(string="Last Visit")
+    last_doctor_id = fields.Many2one('consultation.doctor', string="Last Doctor", ondelete='set null')
+    last_reference_id = fields.Char(string="Last Reference ID")
+    first_booking_id = fields.Many2one('appointment.booking', string="First Booking", ondelete='set null')
+    last_booking_id = fields.Many2one('appointment.booking', string="Last Appointment", ondelete='set null')
+
+    _sql_constraints = [
+        ('patient_uniq', 'unique(patient_id)', 'Visit statistics already exist for this patient.'),
+    ]
+
+    # Aggregate of the bookings of the patients in %(patients)s (or all of them), one row per patient
+    _AGGREGATE_QUERY = """
+        SELECT booking.patient_id,
+               COUNT(*) FILTER (WHERE booking.state != 'cancelled'),
+               MIN(booking.appointment_date) FILTER (WHERE booking.state != 'cancelled'),
+               MAX(booking.appointment_date) FILTER (WHERE booking.state != 'cancelled'),
+               (ARRAY_AGG(booking.consultation_doctor ORDER BY booking.appointment_date DESC, booking.id DESC)
+                    FILTER (WHERE booking.state != 'cancelled'))[1],
+               (ARRAY_AGG(booking.reference_id ORDER BY booking.id DESC)
+                    FILTER (WHERE booking.reference_id IS NOT NULL))[1],
+               MIN(booking.id),
+               (ARRAY_AGG(booking.id ORDER BY booking.appointment_date DESC, booking.id DESC)
+                    FILTER (WHERE booking.state != 'cancelled'))[1],
+               %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+          FROM appointment_booking booking
+         WHERE booking.patient_id IS NOT NULL {where}
+         GROUP BY booking.patient_id
+    """
+    # Booking fields read by _AGGREGATE_QUERY
+    _AGGREGATED_FIELDS = ['patient_id', 'state', 'appointment_date', 'consultation_doctor', 'reference_id']
+    _COLUMNS = """
+        patient_id, visit_count, first_visit, last_visit, last_doctor_id, last_reference_id,
+        first_booking_id, last_booking_id, create_uid, create_date, write_uid, write_date
+    """
+
+    def init(self):
+        # Backfill the statistics of patients booked before this table existed
+        self.env.cr.execute("""
+            INSERT INTO appointment_patient_stats (%s) %s
+            ON CONFLICT (patient_id) DO NOTHING
+        """ % (self._COLUMNS, self._AGGREGATE_QUERY.format(where='')), {'uid': self.env.uid})
+
+    @api.model
+    def _get_for_patients(self, patient_ids):
+        """Return ``{patient_id: stats record}`` for ``patient_ids`` with one query."""
+        if not patient_ids:
+            return {}
+        stats = self.search_fetch([('patient_id', 'in', list(patient_ids))], [
+            'patient_id', 'visit_count', 'first_visit', 'last_visit', 'last_doctor_id',
+            'last_reference_id', 'first_booking_id', 'last_booking_id',
+        ])
+        return {record.patient_id.id: record for record in stats}
+
+    @api.model
+    def _add_bookings(self, bookings):
+        """Fold newly created ``bookings`` into their patients' statistics with one upsert."""
+        summary = {}
+        for booking in bookings.filtered('patient_id').sorted(lambda b: (b.appointment_date, b.id)):
+            row = summary.setdefault(booking.patient_id.id, {
+                'visit_count': 0, 'first_visit': None, 'last_visit': None, 'last_doctor_id': None,
+                'last_reference_id': None, 'last_reference_booking': 0,
+                'first_booking_id': booking.id, 'last_booking_id': None,
+            })
+            row['first_booking_id'] = min(row['first_booking_id'], booking.id)
+            if booking.reference_id and booking.id >= row['last_reference_booking']:
+                row.update(last_reference_id=booking.reference_id, last_reference_booking=booking.id)
+            if booking.state == 'cancelled':
+                continue
+            row['visit_count'] += 1
+            row['first_visit'] = row['first_visit'] or booking.appointment_date
+            row.update(
+                last_visit=booking.appointment_date,
+                last_doctor_id=booking.consultation_doctor.id or None,
+                last_booking_id=booking.id,
+            )
+        if not summary:
+            return
+
+        now = fields.Datetime.now()
+        values = [(
+            patient_id, row['visit_count'], row['first_visit'], row['last_visit'], row['last_doctor_id'],
+            row['last_reference_id'], row['first_booking_id'], row['last_booking_id'],
+            self.env.uid, now, self.env.uid, now,
+        ) for patient_id, row in summary.items()]
+        newer = "EXCLUDED.last_visit IS NOT NULL AND (stats.last_visit IS NULL OR EXCLUDED.last_visit >= stats.last_visit)"
+        self.flush_model()
+        self.env.cr.execute("""
+            INSERT INTO appointment_patient_stats AS stats (%s) VALUES %s
+            ON CONFLICT (patient_id) DO UPDATE SET
+                visit_count = stats.visit_count + EXCLUDED.visit_count,
+                first_visit = LEAST(stats.first_visit, EXCLUDED.first_visit),
+                last_visit = GREATEST(stats.last_visit, EXCLUDED.last_visit),
+                last_doctor_id = CASE WHEN %s THEN EXCLUDED.last_doctor_id ELSE stats.last_doctor_id END,
+                last_booking_id = CASE WHEN %s THEN EXCLUDED.last_booking_id ELSE stats.last_booking_id END,
+                last_reference_id = COALESCE(EXCLUDED.last_reference_id, stats.last_reference_id),
+                first_booking_id = LEAST(stats.first_booking_id, EXCLUDED.first_booking_id),
+                write_uid = EXCLUDED.write_uid,
+                write_date = EXCLUDED.write_date
+        """ % (self._COLUMNS, ', '.join(['%s'] * len(values)), newer, newer), values)
+        self.invalidate_model()
+
+    @api.model
+    def _refresh_patients(self, patient_ids):
+        """Recompute the statistics of ``patient_ids`` from their bookings (after cancel, edit or delete)."""
+        patient_ids = tuple(pid for pid in set(patient_ids) if pid)
+        if not patient_ids:
+            return
+        # Only the aggregated columns: flushing the whole model would run the pending
+        # patient_type recomputes against the statistics about to be rebuilt
+        self.env['appointment.booking'].flush_model(self._AGGREGATED_FIELDS)
+        self.flush_model()
+        self.env.cr.execute("""
+            DELETE FROM appointment_patient_stats stats
+             WHERE stats.patient_id IN %s
+               AND NOT EXISTS (SELECT 1 FROM appointment_booking booking WHERE booking.patient_id = stats.patient_id)
+        """, [patient_ids])
+        self.env.cr.execute("""
+            INSERT INTO appointment_patient_stats (%s) %s
+            ON CONFLICT (patient_id) DO UPDATE SET
+                visit_count = EXCLUDED.visit_count,
+                first_visit = EXCLUDED.first_visit,
+                last_visit = EXCLUDED.last_visit,
+                last_doctor_id = EXCLUDED.last_doctor_id,
+                last_reference_id = EXCLUDED.last_reference_id,
+                first_booking_id = EXCLUDED.first_booking_id,
+                last_booking_id = EXCLUDED.last_booking_id,
+                write_uid = EXCLUDED.write_uid,
+                write_date = EXCLUDED.write_date
+        """ % (self._COLUMNS, self._AGGREGATE_QUERY.format(where='AND booking.patient_id IN %(patients)s')),
+            {'uid': self.env.uid, 'patients': patient_ids})
+        self.invalidate_model()
+        # The first booking may have changed: every booking of these patients is new or old again
+        bookings = self.env['appointment.booking'].search([('patient_id', 'in', patient_ids)])
+        self.env.add_to_compute(bookings._fields['patient_type'], bookings)
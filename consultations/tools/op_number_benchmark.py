@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""Throughput of OP number allocation under concurrent registrations.
+
+Run from an Odoo shell on a disposable database (numbers drawn here are
+consumed from the real ``appointment.op_number`` sequence)::
+
+    odoo-bin shell -d bench_db
+    >>> from odoo.addons.consultations.tools.op_number_benchmark import run_op_number_benchmark
+    >>> run_op_number_benchmark(env, sessions=32, registrations=200)
+
+Each session is a thread with its own cursor that repeatedly allocates one
+number and commits, like front-desk registrations. Per-number
+``next_by_code`` is compared with the block allocator; the report gives
+the wall time, numbers per second and checks that no number was handed
+out twice.
+"""
+import logging
+import threading
+import time
+
+from odoo import SUPERUSER_ID, api
+
+_logger = logging.getLogger(__name__)
+
+
+def _next_by_code(env):
+    return env['ir.sequence'].next_by_code('appointment.op_number')
+
+
+def _block_allocator(env):
+    return env['appointment.op.number.allocator'].allocate(1)[0]
+
+
+STRATEGIES = [
+    ('next_by_code', _next_by_code),
+    ('block allocator', _block_allocator),
+]
+
+
+def _session(registry, allocate, registrations, numbers, errors, barrier):
+    try:
+        with registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            barrier.wait()
+            for _i in range(registrations):
+                numbers.append(allocate(env))
+                cr.commit()
+    except Exception as e:  # reported in the summary
+        errors.append(e)
+
+
+def run_op_number_benchmark(env, sessions=16, registrations=200, strategies=STRATEGIES):
+    """Allocate ``registrations`` numbers in each of ``sessions`` concurrent sessions per strategy."""
+    rows = []
+    for name, allocate in strategies:
+        numbers, errors = [], []
+        barrier = threading.Barrier(sessions + 1)
+        threads = [
+            threading.Thread(target=_session, args=(env.registry, allocate, registrations, numbers, errors, barrier))
+            for _i in range(sessions)
+        ]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        wall_time = time.perf_counter() - start
+
+        row = {
+            'strategy': name,
+            'sessions': sessions,
+            'numbers': len(numbers),
+            'wall_time': round(wall_time, 3),
+            'numbers_per_second': round(len(numbers) / wall_time, 1) if wall_time else None,
+            'duplicates': len(numbers) - len(set(numbers)),
+            'errors': len(errors),
+        }
+        _logger.info("%-16s %3d sessions %7d numbers %8.3fs %10s numbers/s  duplicates: %d  errors: %d",
+                     name, sessions, row['numbers'], row['wall_time'], row['numbers_per_second'],
+                     row['duplicates'], row['errors'])
+        rows.append(row)
+    return rows
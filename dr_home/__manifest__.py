@@ -1,6 +1,6 @@
 {
     'name': 'Doctor Home',
-    'version': '1.0',
+    'version': '1.1',
     'summary': 'Manage Doctor Appointments, Medicines, Dosages, and Medicine Lines',
     'description': """
         This module provides functionality to manage doctor appointments, medicines, dosages, and medicine lines.
@@ -0,0 +1,86 @@
+"""Merge the duplicate doctor appointments before UNIQUE(reference_id, appointment_date) is added.
+
+The appointments sharing a reference id and a date become the one with the
+lowest id, as the former create() de-duplication did: its empty columns take
+the latest non-empty value of the duplicates, and their prescriptions,
+attachments and bookings move to it before the duplicates are deleted.
+"""
+import logging
+
+from odoo.tools import sql
+
+_logger = logging.getLogger(__name__)
+
+# Columns that identify or audit the row rather than hold the visit's data
+SKIPPED_COLUMNS = {'id', 'reference_id', 'appointment_date', 'create_uid', 'create_date'}
+
+
+def migrate(cr, version):
+    if not version or not sql.table_exists(cr, 'doctor_appointments'):
+        return
+    cr.execute("""
+        CREATE TEMP TABLE appointment_merge ON COMMIT DROP AS
+        SELECT id AS duplicate_id, MIN(id) OVER visit AS survivor_id
+          FROM doctor_appointments
+         WHERE reference_id IS NOT NULL AND appointment_date IS NOT NULL
+        WINDOW visit AS (PARTITION BY reference_id, appointment_date)
+    """)
+    cr.execute("DELETE FROM appointment_merge WHERE duplicate_id = survivor_id")
+    cr.execute("SELECT 1 FROM appointment_merge LIMIT 1")
+    if not cr.rowcount:
+        return
+
+    cr.execute("""
+        SELECT column_name FROM information_schema.columns
+         WHERE table_schema = current_schema() AND table_name = 'doctor_appointments'
+    """)
+    columns = [row[0] for row in cr.fetchall() if row[0] not in SKIPPED_COLUMNS]
+    cr.execute("""
+        UPDATE doctor_appointments survivor
+           SET {updates}
+          FROM (SELECT DISTINCT survivor_id FROM appointment_merge) merge
+         WHERE survivor.id = merge.survivor_id
+    """.format(updates=', '.join(
+        '"{0}" = COALESCE(survivor."{0}", (SELECT duplicate."{0}" FROM appointment_merge dup'
+        ' JOIN doctor_appointments duplicate ON duplicate.id = dup.duplicate_id'
+        ' WHERE dup.survivor_id = survivor.id AND duplicate."{0}" IS NOT NULL'
+        ' ORDER BY duplicate.id DESC LIMIT 1))'.format(column)
+        for column in columns
+    )))
+
+    # Prescriptions: keep one line per medicine on the merged appointment
+    cr.execute("""
+        DELETE FROM doctor_medicine_lines line
+         USING appointment_merge merge
+         WHERE line.appointment_id = merge.duplicate_id
+           AND EXISTS (SELECT 1 FROM doctor_medicine_lines kept
+                        WHERE kept.appointment_id = merge.survivor_id AND kept.medicine_id = line.medicine_id)
+    """)
+    cr.execute("""
+        UPDATE doctor_medicine_lines line SET appointment_id = merge.survivor_id
+          FROM appointment_merge merge
+         WHERE line.appointment_id = merge.duplicate_id
+    """)
+    if sql.table_exists(cr, 'doctor_appointments_ir_attachments_rel'):
+        cr.execute("""
+            INSERT INTO doctor_appointments_ir_attachments_rel (appointment_id, attachment_id)
+            SELECT DISTINCT merge.survivor_id, rel.attachment_id
+              FROM doctor_appointments_ir_attachments_rel rel
+              JOIN appointment_merge merge ON merge.duplicate_id = rel.appointment_id
+            ON CONFLICT DO NOTHING
+        """)
+    cr.execute("""
+        UPDATE ir_attachment attachment SET res_id = merge.survivor_id
+          FROM appointment_merge merge
+         WHERE attachment.res_model = 'doctor.appointments' AND attachment.res_id = merge.duplicate_id
+    """)
+    if sql.column_exists(cr, 'appointment_booking', 'doctor_appointment_id'):
+        cr.execute("""
+            UPDATE appointment_booking booking SET doctor_appointment_id = merge.survivor_id
+              FROM appointment_merge merge
+             WHERE booking.doctor_appointment_id = merge.duplicate_id
+        """)
+
+    cr.execute("DELETE FROM doctor_appointments WHERE id IN (SELECT duplicate_id FROM appointment_merge)")
+    _logger.info("🧹 Merged %d duplicate doctor appointments before adding the (reference_id, appointment_date) key.",
+                 cr.rowcount)
@@ -2,3 +2,5 @@ from.import doctor_appointments
 from . import medicines
 from . import dosages
 from . import medicine_lines
+from . import patient_vitals
+from . import patient_history_page
@@ -1,4 +1,31 @@
+import logging
+from bisect import bisect_left
+from collections import defaultdict
+
+import psycopg2
+from markupsafe import Markup
+
 from odoo import models, fields, api
+from odoo.exceptions import UserError
+from odoo.tools import sql
+
+from .patient_vitals import DEFAULT_VITALS, VITAL_FIELDS
+
+_logger = logging.getLogger(__name__)
+
+# Clinical fields shown in each visit's entry of the patient history, in display order
+HISTORY_FIELDS = [
+    "chief_complaint", "associated_complaint", "past_history", "family_history", "present_history",
+    "diagnosis", "investigations", "others", "panchakarma_advice",
+    "artava", "nadi", "agni", "mala", "mutra", "nidra", "manas",
+]
+# What the history panel shows of each past visit and of its prescriptions
+HISTORY_PANEL_FIELDS = ['appointment_date', 'consultation_doctor', 'history_entry', 'htn', 'dm', 'th']
+PRESCRIPTION_PANEL_FIELDS = ['appointment_id', 'medicine_id', 'dosage_id', 'course', 'days', 'quantity', 'usage']
+# Cursor cache entry of the histories loaded by DoctorAppointments._load_patient_history
+HISTORY_CACHE_KEY = 'doctor_appointments_patient_history'
+# Fields locating a visit in its patient's vitals history
+VITALS_KEY_FIELDS = {'patient_id', 'reference_id', 'appointment_date'}
 
 class DoctorAppointments(models.Model):
     _name = "doctor.appointments"
@@ -8,7 +35,7 @@ class DoctorAppointments(models.Model):
     booking_id = fields.Many2one('appointment.booking', string="Appointment Booking", readonly=True)
     patient_id = fields.Many2one('res.partner', string="Patient", required=True)
     name = fields.Char(string="Patient Name", related="patient_id.name", readonly=True)
-    reference_id = fields.Char(string="Patient Reference ID")
+    reference_id = fields.Char(string="Patient Reference ID", index=True)
     op_number = fields.Char(string="OP Number")
     appointment_date = fields.Date(string="Appointment Date")
 
@@ -62,16 +89,102 @@ class DoctorAppointments(models.Model):
     ], string="Diet")
 
     special_note=fields.Char(string="Special Note")
+
+    # One appointment per patient reference and day; the index also serves the create lookups
+    _sql_constraints = [
+        ('reference_date_unique', 'UNIQUE(reference_id, appointment_date)',
+         'An appointment already exists for this Patient Reference ID on this date.'),
+    ]
+
+    def init(self):
+        # Partial reference id search of the front-desk patient lookup
+        if self.env.registry.has_trigram:
+            sql.create_index(self.env.cr, 'doctor_appointments_reference_id_trgm_idx', self._table,
+                             ['reference_id gin_trgm_ops'], method='gin')
+        # Pages of a patient's history, latest first
+        sql.create_index(self.env.cr, 'doctor_appointments_patient_history_idx', self._table,
+                         ['patient_id', 'appointment_date DESC', 'id DESC'])
+
+    def _load_patient_history(self):
+        """Return the appointment history of the patients in ``self``, each patient read once per transaction.
+
+        Shared by the history computes: the first of them loads the missing
+        patients with one windowed query and the others reuse it from the
+        cursor cache, which every create, write and unlink of appointments
+        clears. Returns ``{patient_id: {'count', 'ids', 'dates', 'visits'}}``
+        where ``count`` counts all the patient's appointments and ``visits``
+        holds the dated ones in chronological order, ``dates`` being their
+        dates.
+        """
+        histories = self.env.cr.cache.setdefault(HISTORY_CACHE_KEY, {})
+        missing = [patient_id for patient_id in set(self.patient_id.ids) if patient_id not in histories]
+        if not missing:
+            return histories
+        self.flush_model(['patient_id', 'appointment_date'])
+        self.env.cr.execute("""
+            SELECT id, patient_id, appointment_date, COUNT(*) OVER (PARTITION BY patient_id) AS visit_count
+              FROM doctor_appointments
+             WHERE patient_id = ANY(%s)
+             ORDER BY patient_id, appointment_date, id
+        """, [missing])
+
+        for patient_id in missing:
+            histories[patient_id] = {'count': 0, 'ids': set(), 'dates': [], 'visits': []}
+        for visit in self.env.cr.dictfetchall():
+            history = histories[visit['patient_id']]
+            history['count'] = visit['visit_count']
+            history['ids'].add(visit['id'])
+            if visit['appointment_date']:
+                history['dates'].append(visit['appointment_date'])
+                history['visits'].append(visit)
+        return histories
+
+    @api.model
+    def _invalidate_history_cache(self):
+        """Forget the histories loaded by ``_load_patient_history``, e.g. after changing appointments in SQL."""
+        self.env.cr.cache.pop(HISTORY_CACHE_KEY, None)
+
+    @api.model
+    def _past_visits(self, histories, record):
+        """Return the visits of ``record``'s patient before its date, oldest first."""
+        history = histories.get(record.patient_id.id)
+        if not history or not record.appointment_date:
+            return []
+        return history['visits'][:bisect_left(history['dates'], record.appointment_date)]
+
+    def _has_earlier_visit(self, histories):
+        """Tell whether the patient had an appointment before this one: by date, else by creation order."""
+        self.ensure_one()
+        if self.appointment_date:
+            return bool(self._past_visits(histories, self))
+        history = histories.get(self.patient_id.id)
+        return bool(history and self._origin.id and any(visit_id < self._origin.id for visit_id in history['ids']))
+
      # Compute Patient Type based on Previous Appointments
-    @api.depends('patient_id')
+    @api.depends('patient_id', 'booking_id', 'appointment_date')
     def _compute_patient_type(self):
         """ Determine if the patient is new or old based on past appointments. """
+        if 'appointment.patient.stats' in self.env:
+            # Patient visit statistics of the consultations module, one query for the batch
+            stats_by_patient = self.env['appointment.patient.stats']._get_for_patients(self.patient_id.ids)
+            # Direct appointments have no booking to compare: they are compared with the earlier visits
+            histories = self.filtered(lambda record: not record.booking_id)._load_patient_history()
+            for record in self:
+                stats = stats_by_patient.get(record.patient_id.id)
+                if record.booking_id:
+                    first_booking = stats.first_booking_id.id if stats else False
+                    record.patient_type = 'old' if first_booking and first_booking != record.booking_id.id else 'new'
+                    continue
+                first_visit = stats.first_visit if stats else False
+                booked_before = bool(first_visit and record.appointment_date and first_visit < record.appointment_date)
+                record.patient_type = 'old' if booked_before or record._has_earlier_visit(histories) else 'new'
+            return
+        histories = self._load_patient_history()
         for record in self:
-            past_appointments = self.env['doctor.appointments'].search_count([
-                ('patient_id', '=', record.patient_id.id),
-                ('id', '!=', record.id)
-            ])
-            record.patient_type = 'old' if past_appointments else 'new'
+            history = histories.get(record.patient_id.id)
+            # Other appointments than this one
+            others = history['count'] - (1 if record._origin.id in history['ids'] else 0) if history else 0
+            record.patient_type = 'old' if others else 'new'
 
     # Attachments
     attachment_ids = fields.Many2many(
@@ -81,7 +194,8 @@ class DoctorAppointments(models.Model):
         string="Attachments"
     )
 
-    # Fetch previous prescriptions
+    # Fetch previous prescriptions; the chart shows the latest PREVIOUS_MEDICINES_PAGE lines
+    PREVIOUS_MEDICINES_PAGE = 40
     previous_medicine_line_ids = fields.One2many(
         'doctor.medicine.lines',
         compute="_compute_previous_medicine_lines",
@@ -94,18 +208,36 @@ class DoctorAppointments(models.Model):
         ('completed', 'Consultation Completed'),
         ('cancelled', 'Cancelled')
     ], string="Status", default='booked', tracking=True)
-    @api.model
-    def create(self, vals):
-        """Automatically set the status to 'completed' when creating a new appointment."""
-        if 'state' not in vals:
-            vals['state'] = 'completed'
-        return super(DoctorAppointments, self).create(vals)
-
     def write(self, vals):
         """Ensure the status is updated to 'completed' when saving."""
         if 'state' not in vals:
             vals['state'] = 'completed'
-        return super(DoctorAppointments, self).write(vals)
+        if VITALS_KEY_FIELDS.intersection(vals):
+            self._invalidate_history_cache()
+        if not VITALS_KEY_FIELDS.intersection(vals) and not set(VITAL_FIELDS).intersection(vals):
+            return super(DoctorAppointments, self).write(vals)
+
+        # Vitals snapshots of these visits as they were, for the visits after their old dates
+        previous_snapshots = self.env['doctor.patient.vitals'].search_fetch(
+            [('appointment_id', 'in', self.ids)], ['patient_id', 'reference_id', 'effective_date'])
+        old_keys = [(snapshot.patient_id.id, snapshot.reference_id, snapshot.effective_date)
+                    for snapshot in previous_snapshots]
+        result = super(DoctorAppointments, self).write(vals)
+        Vitals = self.env['doctor.patient.vitals']
+        Vitals._record(self.ids)
+        Vitals._propagate(old_keys)
+        return result
+
+    def unlink(self):
+        """Hand the visits after a deleted vitals snapshot back to the snapshot before it."""
+        snapshots = self.env['doctor.patient.vitals'].search_fetch(
+            [('appointment_id', 'in', self.ids)], ['patient_id', 'reference_id', 'effective_date'])
+        old_keys = [(snapshot.patient_id.id, snapshot.reference_id, snapshot.effective_date) for snapshot in snapshots]
+        result = super(DoctorAppointments, self).unlink()
+        self._invalidate_history_cache()
+        self.env['doctor.patient.vitals'].invalidate_model()
+        self.env['doctor.patient.vitals']._propagate(old_keys)
+        return result
 
     # Previous Complaints List (Many2many for Flexibility)
     previous_complaints_ids = fields.Many2many(
@@ -121,142 +253,332 @@ class DoctorAppointments(models.Model):
         string="Last Appointment History"
     )
 
-    # Computed Field for Patient History as Direct Text (With Bold Dates)
+    # Visits in the patient history of the form and per get_patient_history page by default
+    HISTORY_PAGE = 10
+    # Largest page get_patient_history returns
+    HISTORY_PAGE_MAX = 50
+
+    # Computed Field for Patient History as Direct Text (With Bold Dates), limited to the latest HISTORY_PAGE visits
     previous_complaints_text = fields.Html(string="Patient History", compute="_compute_previous_complaints_text")
+    # This visit's rendered part of the patient history, re-rendered only when its clinical fields change
+    history_entry = fields.Html(string="History Entry", compute="_compute_history_entry", store=True, sanitize=False)
 
-    @api.depends('patient_id', 'appointment_date')
+    @api.depends('patient_id', 'reference_id', 'appointment_date')
     def _compute_vitals(self):
-        """Fetch the latest vitals (HTN, DM, TH) from previous appointments."""
+        """Read the vitals (HTN, DM, TH) from the patient's latest snapshot.
+
+        Snapshots only change through ``doctor.patient.vitals``, which
+        updates the affected later visits itself, so editing one visit
+        no longer recomputes every visit after it.
+        """
+        vitals = self.env['doctor.patient.vitals']._get_vitals(self)
+        for record in self:
+            # If no snapshot yet, set the default values
+            record.update(vitals.get(record, DEFAULT_VITALS))
+
+    @api.depends('appointment_date', *HISTORY_FIELDS)
+    def _compute_history_entry(self):
+        """Render this visit's entry of the patient history, with bold dates and only entered fields."""
         for record in self:
-            # Search for the most recent appointment for the same patient and reference_id
-            last_appointment = self.env['doctor.appointments'].search([
-                ('patient_id', '=', record.patient_id.id),
-                ('reference_id', '=', record.reference_id),
-                ('appointment_date', '<', record.appointment_date)
-            ], order="appointment_date desc", limit=1)
-
-            if last_appointment:
-                record.htn = last_appointment.htn
-                record.dm = last_appointment.dm
-                record.th = last_appointment.th
-            else:
-                # If no previous appointment, set the default values
-                record.htn = 'Non HTN'
-                record.dm = 'Non DM'
-                record.th = 'Non TH'
+            entry = Markup("<b>Date:</b> %s<br/>") % (record.appointment_date or '')
+            for field in HISTORY_FIELDS:
+                value = record[field]
+                if value:
+                    entry += Markup("<b>%s:</b> %s<br/>") % (field.replace('_', ' ').title(), value)
+            record.history_entry = entry
 
     @api.depends('patient_id', 'appointment_date')
     def _compute_previous_complaints_text(self):
-        """Generate patient history in text format with bold dates and only entered fields."""
+        """Assemble the patient history from the stored entries of the latest HISTORY_PAGE past visits.
+
+        Older visits are paged in through ``get_patient_history``, so the
+        form costs the same however long the patient's history is; nothing
+        is rendered here.
+        """
+        dated = self.filtered(lambda record: record.patient_id and record.appointment_date)
+        entries = defaultdict(list)
+        if dated:
+            self.flush_model(['patient_id', 'appointment_date', 'history_entry'])
+            self.env.cr.execute("""
+                SELECT src.idx, visit.history_entry
+                  FROM unnest(%s::int[], %s::int[], %s::date[]) AS src (idx, patient_id, appointment_date)
+                 CROSS JOIN LATERAL (
+                       SELECT history_entry, appointment_date, id FROM doctor_appointments
+                        WHERE patient_id = src.patient_id AND appointment_date < src.appointment_date
+                        ORDER BY appointment_date DESC, id DESC
+                        LIMIT %s
+                 ) visit
+                 ORDER BY src.idx, visit.appointment_date DESC, visit.id DESC
+            """, [
+                list(range(len(dated))),
+                [record.patient_id.id for record in dated],
+                [record.appointment_date for record in dated],
+                self.HISTORY_PAGE + 1,
+            ])
+            for idx, entry in self.env.cr.fetchall():
+                entries[dated[idx]].append(entry)
+
         for record in self:
-            if record.patient_id:
-                past_appointments = self.env['doctor.appointments'].search([ 
-                    ('patient_id', '=', record.patient_id.id),
-                    ('appointment_date', '<', record.appointment_date),
-                    ('id', '!=', record.id)
-                ], order="appointment_date desc")
-
-                history_text = ""
-                for appointment in past_appointments:
-                    entry = f"<b>Date:</b> {appointment.appointment_date}<br/>"
-                    for field in ["chief_complaint", "associated_complaint", "past_history", "family_history",
-                                  "present_history", "diagnosis", "investigations", "others", "panchakarma_advice",
-                                  "artava", "nadi", "agni", "mala", "mutra", "nidra", "manas"]:
-                        value = getattr(appointment, field)
-                        if value:
-                            entry += f"<b>{field.replace('_', ' ').title()}:</b> {value}<br/>"
-                    history_text += entry + "<br/>"
-
-                record.previous_complaints_text = history_text.strip()
+            if not record.patient_id:
+                record.previous_complaints_text = False
+                continue
+            visits = entries.get(record, [])
+            text = Markup('').join(Markup(entry or '') + Markup("<br/>") for entry in visits[:self.HISTORY_PAGE])
+            if len(visits) > self.HISTORY_PAGE:
+                text += Markup("<i>Showing the latest %d visits; use Load Older History for the older ones.</i>") % self.HISTORY_PAGE
+            record.previous_complaints_text = text
 
     @api.depends('patient_id', 'appointment_date')
     def _compute_previous_complaints(self):
         """Fetch previous complaints till yesterday's date."""
+        histories = self._load_patient_history()
         for record in self:
-            if record.patient_id and record.appointment_date:
-                past_appointments = self.env['doctor.appointments'].search([ 
-                    ('patient_id', '=', record.patient_id.id),
-                    ('appointment_date', '<', record.appointment_date),
-                    ('id', '!=', record.id)
-                ], order="appointment_date desc")
-
-                record.previous_complaints_ids = [(6, 0, past_appointments.ids)]
+            past_appointments = self._past_visits(histories, record)
+            record.previous_complaints_ids = [(6, 0, [visit['id'] for visit in reversed(past_appointments)])]
 
-    @api.depends('patient_id')
+    @api.depends('patient_id', 'appointment_date')
     def _compute_previous_history(self):
         """Fetch past history from the last appointment."""
+        histories = self._load_patient_history()
         for record in self:
-            if record.patient_id:
-                last_appointment = self.env['doctor.appointments'].search([ 
-                    ('patient_id', '=', record.patient_id.id),
-                    ('appointment_date', '<', record.appointment_date),
-                    ('id', '!=', record.id)
-                ], order="appointment_date desc", limit=1)
-
-                record.last_history_id = last_appointment
+            past_appointments = self._past_visits(histories, record)
+            record.last_history_id = past_appointments[-1]['id'] if past_appointments else False
 
     @api.depends('patient_id', 'appointment_date')
     def _compute_previous_medicine_lines(self):
-        """Fetch prescribed medicines from past appointments and set prescription_date to appointment date."""
+        """Show the latest medicines of the patient's past appointments; nothing is written.
+
+        One query for the whole batch reads at most PREVIOUS_MEDICINES_PAGE
+        lines per record; older ones are paged by
+        ``action_show_previous_medicines``.
+        """
+        dated = self.filtered(lambda record: record.patient_id and record.appointment_date)
+        line_ids = defaultdict(list)
+        if dated:
+            self.flush_model(['patient_id', 'appointment_date'])
+            self.env['doctor.medicine.lines'].flush_model(['appointment_id', 'prescription_date'])
+            self.env.cr.execute("""
+                SELECT src.idx, line.id
+                  FROM unnest(%s::int[], %s::int[], %s::date[]) AS src (idx, patient_id, appointment_date)
+                 CROSS JOIN LATERAL (
+                       SELECT line.id, line.prescription_date
+                         FROM doctor_medicine_lines line
+                         JOIN doctor_appointments visit ON visit.id = line.appointment_id
+                        WHERE visit.patient_id = src.patient_id AND visit.appointment_date < src.appointment_date
+                        ORDER BY line.prescription_date DESC, line.id DESC
+                        LIMIT %s
+                 ) line
+                 ORDER BY src.idx, line.prescription_date DESC, line.id DESC
+            """, [
+                list(range(len(dated))),
+                [record.patient_id.id for record in dated],
+                [record.appointment_date for record in dated],
+                self.PREVIOUS_MEDICINES_PAGE,
+            ])
+            for idx, line_id in self.env.cr.fetchall():
+                line_ids[dated[idx]].append(line_id)
+
         for record in self:
-            if record.patient_id and record.appointment_date:
-                # Fetch previous appointments till the current appointment date
-                past_appointments = self.env['doctor.appointments'].search([ 
-                    ('patient_id', '=', record.patient_id.id),
-                    ('appointment_date', '<', record.appointment_date),
-                    ('id', '!=', record.id)
-                ], order="appointment_date desc")
-
-                # Fetch the previous medicines
-                previous_medicines = self.env['doctor.medicine.lines'].search([
-                    ('appointment_id', 'in', past_appointments.ids)
-                ])
-
-                # Update prescription_date of each medicine line
-                for medicine_line in previous_medicines:
-                    # Set the prescription_date of each medicine line to the appointment_date
-                    medicine_line.prescription_date = medicine_line.appointment_id.appointment_date
-
-                # Assign the medicines to the field previous_medicine_line_ids
-                record.previous_medicine_line_ids = [(6, 0, previous_medicines.ids)]
+            record.previous_medicine_line_ids = [(6, 0, line_ids.get(record, []))]
 
-    # Method to show past appointments based on Patient Reference ID
-    def action_show_past_appointments(self):
-        past_appointments = self.env['doctor.appointments'].search([
+    def _previous_medicines_domain(self):
+        self.ensure_one()
+        return [('appointment_id', 'any', [
             ('patient_id', '=', self.patient_id.id),
-            ('reference_id', '=', self.reference_id),
-            ('appointment_date', '<', self.appointment_date)
-        ])
+            ('appointment_date', '<', self.appointment_date),
+            ('id', '!=', self._origin.id),
+        ])]
+
+    def _get_previous_medicine_lines(self, offset=0, limit=None):
+        """Return a page of the medicines of the patient's past appointments, latest first, with one query."""
+        self.ensure_one()
+        if not self.patient_id or not self.appointment_date:
+            return self.env['doctor.medicine.lines']
+        return self.env['doctor.medicine.lines'].search(
+            self._previous_medicines_domain(), offset=offset, limit=limit, order="prescription_date desc, id desc")
+
+    def get_patient_history(self, cursor=None, limit=None):
+        """Return a page of the patient's past visits with their prescriptions, latest first.
+
+        Pass the returned ``next_cursor`` to get the next, older page; it is
+        False on the last page. Pages are read by keyset on
+        (appointment_date, id) with only the fields the history panel shows,
+        so every page costs the same few queries.
+        """
+        self.ensure_one()
+        limit = min(limit or self.HISTORY_PAGE, self.HISTORY_PAGE_MAX)
+        if not self.patient_id or not self.appointment_date:
+            return {'visits': [], 'next_cursor': False}
+        visits = self.search_fetch(self._patient_history_domain(cursor), HISTORY_PANEL_FIELDS,
+                                   order="appointment_date desc, id desc", limit=limit + 1)
+        page, more = visits[:limit], len(visits) > limit
+
+        prescriptions = defaultdict(list)
+        lines = self.env['doctor.medicine.lines'].search_fetch(
+            [('appointment_id', 'in', page.ids)], PRESCRIPTION_PANEL_FIELDS, order="id")
+        for line in lines:
+            prescriptions[line.appointment_id.id].append({
+                'medicine': line.medicine_id.display_name,
+                'dosage': line.dosage_id.display_name or False,
+                'course': line.course,
+                'days': line.days,
+                'quantity': line.quantity,
+                'usage': line.usage,
+            })
+
+        last = page[-1:]
+        return {
+            'visits': [{
+                'id': visit.id,
+                'appointment_date': fields.Date.to_string(visit.appointment_date),
+                'consultation_doctor': visit.consultation_doctor.display_name or False,
+                'history_entry': visit.history_entry,
+                'htn': visit.htn,
+                'dm': visit.dm,
+                'th': visit.th,
+                'prescriptions': prescriptions[visit.id],
+            } for visit in page],
+            'next_cursor': self._history_cursor(last) if more else False,
+        }
+
+    def _patient_history_domain(self, cursor=None):
+        """Domain of the patient's visits before this one, older than ``cursor`` if given."""
+        self.ensure_one()
+        domain = [('patient_id', '=', self.patient_id.id), ('appointment_date', '<', self.appointment_date)]
+        if cursor:
+            cursor_date, cursor_id = self._parse_history_cursor(cursor)
+            domain += ['|', ('appointment_date', '<', cursor_date),
+                       '&', ('appointment_date', '=', cursor_date), ('id', '<', cursor_id)]
+        return domain
+
+    @api.model
+    def _history_cursor(self, visit):
+        """Return the ``get_patient_history`` cursor pointing after ``visit``."""
+        return '%s/%d' % (fields.Date.to_string(visit.appointment_date), visit.id)
+
+    @api.model
+    def _parse_history_cursor(self, cursor):
+        """Return the ``(appointment_date, id)`` of a ``get_patient_history`` cursor."""
+        try:
+            cursor_date, cursor_id = cursor.split('/')
+            return fields.Date.to_date(cursor_date), int(cursor_id)
+        except (AttributeError, TypeError, ValueError):
+            raise UserError("Invalid patient history cursor: %r" % (cursor,))
+
+    def action_load_older_history(self):
+        """Open the visits older than the HISTORY_PAGE ones the form shows, loaded a page at a time."""
+        self.ensure_one()
+        if not self.patient_id or not self.appointment_date:
+            raise UserError("Set the patient and the appointment date to see the patient history.")
+        shown = self.search_fetch(self._patient_history_domain(), ['appointment_date'],
+                                  order="appointment_date desc, id desc", limit=self.HISTORY_PAGE)
+        if len(shown) < self.HISTORY_PAGE:
+            raise UserError("The patient history already shows every past visit.")
+        page = self.env['doctor.patient.history.page'].create({
+            'appointment_id': self.id,
+            'next_cursor': self._history_cursor(shown[-1]),
+        })
+        return page.action_load_older()
+
+    def action_show_previous_medicines(self):
+        """Page through all the medicines of the patient's past appointments."""
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_window',
+            'name': 'Previous Medicines',
+            'res_model': 'doctor.medicine.lines',
+            'view_mode': 'list',
+            'domain': self._previous_medicines_domain(),
+            'context': {'create': False},
+            'target': 'current',
+        }
 
-        # Return an action to show the past appointments in a list view
+    # Method to show past appointments based on Patient Reference ID
+    def action_show_past_appointments(self):
+        # Return an action to show the past appointments in a list view; the
+        # list runs the (reference_id indexed) search itself, page by page
         return {
             'type': 'ir.actions.act_window',
             'name': 'Past Appointments',
             'res_model': 'doctor.appointments',
             'view_mode': 'list',
             'views': [(self.env.ref('dr_home.view_doctor_appointments_list').id, 'list')],
-            'domain': [('id', 'in', past_appointments.ids)],
+            'domain': [
+                ('patient_id', '=', self.patient_id.id),
+                ('reference_id', '=', self.reference_id),
+                ('appointment_date', '<', self.appointment_date),
+            ],
             'target': 'current',
         }
     
+    @api.model_create_multi
+    def create(self, vals_list):
+        """Create the appointments, updating the visits that already exist instead.
+
+        A visit is identified by its reference_id and appointment_date, which
+        the database keeps unique. The existing visits of the whole batch are
+        found with one search; new appointments are set to 'completed'.
+        """
+        keys = [self._visit_key(vals) for vals in vals_list]
+        for attempt in range(2):
+            existing = self._find_visits({key for key in keys if key})
+            to_create, to_update, first_index = [], [], {}
+            for index, (key, vals) in enumerate(zip(keys, vals_list)):
+                if key and (key in existing or key in first_index):
+                    # ✅ If found, update the existing record instead of creating a new one
+                    update_fields = {field: vals[field] for field in vals if field not in ['id', 'reference_id', 'appointment_date']}
+                    to_update.append((index, key, update_fields))
+                    continue
+                if key:
+                    first_index[key] = index
+                to_create.append((index, dict(vals, state=vals.get('state', 'completed'))))
+            try:
+                with self.env.cr.savepoint():
+                    created = super(DoctorAppointments, self).create([vals for index, vals in to_create])
+                self._invalidate_history_cache()
+                break
+            except psycopg2.errors.UniqueViolation:
+                # Another session registered one of these visits in the meantime
+                if attempt:
+                    raise
+                _logger.warning("⚠️ Appointment registered concurrently, retrying")
+                self.env.invalidate_all()
+
+        records = dict(zip((index for index, vals in to_create), created))
+        for key, record in zip((keys[index] for index, vals in to_create), created):
+            if key:
+                existing.setdefault(key, record)
+        for index, key, update_fields in to_update:
+            existing[key].write(update_fields)
+            records[index] = existing[key]
+
+        # Vitals entered by the doctor start a new snapshot when they differ from the inherited ones
+        self.env['doctor.patient.vitals']._record([
+            record.id for (index, vals), record in zip(to_create, created) if set(VITAL_FIELDS).intersection(vals)
+        ])
+        return self.browse([records[index].id for index in range(len(vals_list))])
+
+    @api.model
+    def _visit_key(self, vals):
+        """Return the ``(reference_id, appointment_date)`` identifying the visit of ``vals``, if complete."""
+        reference_id = vals.get('reference_id')
+        appointment_date = fields.Date.to_date(vals.get('appointment_date'))
+        return (reference_id, appointment_date) if reference_id and appointment_date else None
+
     @api.model
-    def create(self, vals):
-        """Prevent duplicates when importing by checking reference_id and appointment_date before creating new records."""
- 
-        # ✅ Check if an appointment already exists with the same reference ID and date
-        existing_appointment = self.env['doctor.appointments'].search([
-            ('reference_id', '=', vals.get('reference_id')),
-            ('appointment_date', '=', vals.get('appointment_date'))
-        ], limit=1)
- 
-        if existing_appointment:
-            # ✅ If found, update the existing record instead of creating a new one
-            update_fields = {key: vals[key] for key in vals if key not in ['id', 'reference_id', 'appointment_date']}
-            existing_appointment.write(update_fields)
-            return existing_appointment  # Return the existing record instead of a new one
- 
-        # ✅ If no match is found, create a new appointment as usual
-        return super(DoctorAppointments, self).create(vals)
+    def _find_visits(self, keys):
+        """Return ``{(reference_id, appointment_date): appointment}`` of the existing visits among ``keys``."""
+        if not keys:
+            return {}
+        candidates = self.search_fetch([
+            ('reference_id', 'in', list({reference_id for reference_id, appointment_date in keys})),
+            ('appointment_date', 'in', list({appointment_date for reference_id, appointment_date in keys})),
+        ], ['reference_id', 'appointment_date'])
+        return {
+            (appointment.reference_id, appointment.appointment_date): appointment
+            for appointment in candidates
+            if (appointment.reference_id, appointment.appointment_date) in keys
+        }
     
 
     
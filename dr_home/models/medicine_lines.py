@@ -5,7 +5,7 @@ class DoctorMedicineLines(models.Model):
     _name = 'doctor.medicine.lines'
     _description = 'Medicine Lines'
 
-    appointment_id = fields.Many2one('doctor.appointments', string="Appointment", ondelete='cascade', required=True)
+    appointment_id = fields.Many2one('doctor.appointments', string="Appointment", ondelete='cascade', required=True, index=True)
     reference_id = fields.Char(string="Patient Reference ID", readonly=True)
     medicine_id = fields.Many2one('doctor.medicines', string="Medicine", required=True)
     dosage_id = fields.Many2one('doctor.dosages', string="Dosage")
@@ -18,7 +18,8 @@ class DoctorMedicineLines(models.Model):
         ('4', '4'),
     ], string="Course")
     quantity = fields.Integer(string="Quantity", required=True, default=1)
-    prescription_date = fields.Date(string="Prescription Date", default=fields.Date.today)
+    # Always the date of the appointment the medicine was prescribed in
+    prescription_date = fields.Date(string="Prescription Date", related='appointment_id.appointment_date', store=True)
 
     @api.model
     def create(self, vals):
@@ -0,0 +1,40 @@
+from markupsafe import Markup
+
+from odoo import models, fields
+
+
+class DoctorPatientHistoryPage(models.TransientModel):
+    """Older visits of a patient, loaded a page at a time through ``get_patient_history``."""
+    _name = 'doctor.patient.history.page'
+    _description = 'Older Patient History'
+
+    appointment_id = fields.Many2one('doctor.appointments', string="Appointment", required=True, ondelete='cascade')
+    next_cursor = fields.Char(string="Next Page Cursor")
+    history_html = fields.Html(string="Older History", sanitize=False, readonly=True)
+
+    def action_load_older(self):
+        """Append the next, older page of visits and keep the dialog open."""
+        self.ensure_one()
+        page = self.appointment_id.get_patient_history(cursor=self.next_cursor)
+        self.write({
+            'history_html': Markup(self.history_html or '') + self._render_visits(page['visits']),
+            'next_cursor': page['next_cursor'],
+        })
+        return {
+            'type': 'ir.actions.act_window',
+            'name': 'Older Patient History',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
+
+    def _render_visits(self, visits):
+        """Render the visits of a ``get_patient_history`` page like the form's patient history."""
+        html = Markup('')
+        for visit in visits:
+            html += Markup(visit['history_entry'] or '')
+            for line in visit['prescriptions']:
+                html += Markup("&#8226; %s %s x %s days<br/>") % (line['medicine'], line['dosage'] or '', line['days'])
+            html += Markup("<br/>")
+        return html
@@ -0,0 +1,181 @@
+from odoo import models, fields, api
+
+# Vitals of a patient who has no recorded snapshot yet
+DEFAULT_VITALS = {'htn': 'Non HTN', 'dm': 'Non DM', 'th': 'Non TH'}
+VITAL_FIELDS = list(DEFAULT_VITALS)
+
+# Latest snapshot of the patient and reference before the appointment ``src``
+PREVIOUS_SNAPSHOT_SQL = """
+    SELECT snapshot.htn, snapshot.dm, snapshot.th
+      FROM doctor_patient_vitals snapshot
+     WHERE snapshot.patient_id = src.patient_id
+       AND snapshot.reference_id IS NOT DISTINCT FROM src.reference_id
+       AND snapshot.effective_date < src.appointment_date
+     ORDER BY snapshot.effective_date DESC, snapshot.id DESC
+     LIMIT 1
+"""
+
+
+class DoctorPatientVitals(models.Model):
+    """Time-versioned vitals (HTN, DM, TH) of a patient.
+
+    A snapshot is recorded for the appointment in which a doctor changed the
+    vitals and holds from that appointment's date on. Every other
+    appointment shows the latest snapshot before its date, so a new
+    appointment reads one indexed row and editing an old visit only updates
+    the appointments up to the next snapshot, in one statement.
+    """
+    _name = 'doctor.patient.vitals'
+    _description = 'Patient Vitals Snapshot'
+    _order = 'effective_date desc, id desc'
+
+    appointment_id = fields.Many2one('doctor.appointments', string="Appointment", required=True, ondelete='cascade')
+    patient_id = fields.Many2one('res.partner', string="Patient", required=True)
+    reference_id = fields.Char(string="Patient Reference ID")
+    effective_date = fields.Date(string="Effective From", required=True)
+    htn = fields.Char(string="HTN")
+    dm = fields.Char(string="DM")
+    th = fields.Char(string="TH")
+
+    _sql_constraints = [
+        ('appointment_unique', 'UNIQUE(appointment_id)', "An appointment can only hold one vitals snapshot."),
+    ]
+
+    def init(self):
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS doctor_patient_vitals_lookup_idx
+                ON doctor_patient_vitals (patient_id, reference_id, effective_date DESC, id DESC)
+        """)
+        # Keep the vitals of the appointments made before this table existed
+        self.env.cr.execute("SELECT 1 FROM doctor_patient_vitals LIMIT 1")
+        if self.env.cr.rowcount:
+            return
+        self.env.cr.execute("""
+            INSERT INTO doctor_patient_vitals (
+                appointment_id, patient_id, reference_id, effective_date, htn, dm, th,
+                create_uid, create_date, write_uid, write_date
+            )
+            SELECT id, patient_id, reference_id, appointment_date, htn, dm, th,
+                   %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+              FROM (
+                   SELECT appointment.*,
+                          LAG(ROW(htn, dm, th), 1, ROW(%(htn)s::varchar, %(dm)s::varchar, %(th)s::varchar)) OVER (
+                              PARTITION BY patient_id, reference_id ORDER BY appointment_date, id
+                          ) AS previous
+                     FROM doctor_appointments appointment
+                    WHERE patient_id IS NOT NULL AND appointment_date IS NOT NULL
+              ) appointment
+             WHERE ROW(htn, dm, th) IS DISTINCT FROM previous
+        """, dict(DEFAULT_VITALS, uid=self.env.uid))
+
+    @api.model
+    def _get_vitals(self, appointments):
+        """Return ``{appointment: {'htn', 'dm', 'th'}}``: its own snapshot, else the latest one before its date."""
+        appointments = appointments.filtered(lambda appointment: appointment.patient_id and appointment.appointment_date)
+        if not appointments:
+            return {}
+        self.flush_model()
+        self.env.cr.execute("""
+            SELECT src.idx, own.id, own.htn, own.dm, own.th, previous.htn, previous.dm, previous.th
+              FROM unnest(%s::int[], %s::int[], %s::varchar[], %s::date[], %s::int[])
+                   AS src (idx, patient_id, reference_id, appointment_date, appointment_id)
+              LEFT JOIN doctor_patient_vitals own ON own.appointment_id = src.appointment_id
+              LEFT JOIN LATERAL ({previous}) previous ON TRUE
+        """.format(previous=PREVIOUS_SNAPSHOT_SQL), [
+            list(range(len(appointments))),
+            [appointment.patient_id.id for appointment in appointments],
+            [appointment.reference_id or None for appointment in appointments],
+            [appointment.appointment_date for appointment in appointments],
+            [appointment._origin.id or None for appointment in appointments],
+        ])
+        vitals = {}
+        for idx, own_id, *values in self.env.cr.fetchall():
+            snapshot = values[:3] if own_id else values[3:]
+            vitals[appointments[idx]] = {
+                field: snapshot[index] or DEFAULT_VITALS[field] for index, field in enumerate(VITAL_FIELDS)
+            }
+        return vitals
+
+    @api.model
+    def _record(self, appointment_ids, force=False):
+        """Store the vitals of ``appointment_ids`` as their snapshots and update the later appointments.
+
+        An appointment gets a snapshot when it already has one or when its
+        vitals differ from what it would inherit; ``force`` records them all,
+        e.g. for imported visits whose vitals are authoritative.
+        """
+        if not appointment_ids:
+            return
+        self.env['doctor.appointments'].flush_model(['patient_id', 'reference_id', 'appointment_date'] + VITAL_FIELDS)
+        self.flush_model()
+        self.env.cr.execute("""
+            INSERT INTO doctor_patient_vitals (
+                appointment_id, patient_id, reference_id, effective_date, htn, dm, th,
+                create_uid, create_date, write_uid, write_date
+            )
+            SELECT src.id, src.patient_id, src.reference_id, src.appointment_date, src.htn, src.dm, src.th,
+                   %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+              FROM doctor_appointments src
+              LEFT JOIN doctor_patient_vitals own ON own.appointment_id = src.id
+              LEFT JOIN LATERAL ({previous}) previous ON TRUE
+             WHERE src.id = ANY(%(ids)s)
+               AND src.patient_id IS NOT NULL AND src.appointment_date IS NOT NULL
+               AND (%(force)s OR own.id IS NOT NULL OR ROW(src.htn, src.dm, src.th) IS DISTINCT FROM ROW(
+                    COALESCE(previous.htn, %(htn)s), COALESCE(previous.dm, %(dm)s), COALESCE(previous.th, %(th)s)))
+            ON CONFLICT (appointment_id) DO UPDATE
+               SET patient_id = EXCLUDED.patient_id,
+                   reference_id = EXCLUDED.reference_id,
+                   effective_date = EXCLUDED.effective_date,
+                   htn = EXCLUDED.htn, dm = EXCLUDED.dm, th = EXCLUDED.th,
+                   write_uid = EXCLUDED.write_uid, write_date = EXCLUDED.write_date
+         RETURNING patient_id, reference_id, effective_date
+        """.format(previous=PREVIOUS_SNAPSHOT_SQL),
+            dict(DEFAULT_VITALS, ids=list(appointment_ids), force=force, uid=self.env.uid))
+        self.invalidate_model()
+        self._propagate(self.env.cr.fetchall())
+
+    @api.model
+    def _propagate(self, changes):
+        """Update the vitals of the appointments after each ``(patient_id, reference_id, date)`` of ``changes``.
+
+        Only the appointments up to the next snapshot of the same patient and
+        reference are touched, all with one statement.
+        """
+        earliest = {}
+        for patient_id, reference_id, date in changes:
+            key = (patient_id, reference_id or None)
+            if date and (key not in earliest or date < earliest[key]):
+                earliest[key] = date
+        if not earliest:
+            return
+        self.env['doctor.appointments'].flush_model(['patient_id', 'reference_id', 'appointment_date'] + VITAL_FIELDS)
+        self.flush_model()
+        self.env.cr.execute("""
+            UPDATE doctor_appointments appointment
+               SET htn = COALESCE(previous.htn, %(htn)s),
+                   dm = COALESCE(previous.dm, %(dm)s),
+                   th = COALESCE(previous.th, %(th)s)
+              FROM unnest(%(patients)s::int[], %(references)s::varchar[], %(dates)s::date[])
+                   AS change (patient_id, reference_id, changed_on)
+              JOIN doctor_appointments src
+                ON src.patient_id = change.patient_id
+               AND src.reference_id IS NOT DISTINCT FROM change.reference_id
+               AND src.appointment_date > change.changed_on
+              LEFT JOIN LATERAL ({previous}) previous ON TRUE
+             WHERE appointment.id = src.id
+               AND src.appointment_date <= COALESCE((
+                   SELECT MIN(next.effective_date) FROM doctor_patient_vitals next
+                    WHERE next.patient_id = change.patient_id
+                      AND next.reference_id IS NOT DISTINCT FROM change.reference_id
+                      AND next.effective_date > change.changed_on
+                   ), 'infinity')
+               AND NOT EXISTS (SELECT 1 FROM doctor_patient_vitals own WHERE own.appointment_id = src.id)
+         RETURNING appointment.id
+        """.format(previous=PREVIOUS_SNAPSHOT_SQL), dict(
+            DEFAULT_VITALS,
+            patients=[key[0] for key in earliest],
+            references=[key[1] for key in earliest],
+            dates=list(earliest.values()),
+        ))
+        updated = self.env['doctor.appointments'].browse([row[0] for row in self.env.cr.fetchall()])
+        updated.invalidate_recordset(VITAL_FIELDS)
@@ -0,0 +1,162 @@
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from odoo import Command
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestHistoryQueries(TransactionCase):
+    """The history computes cost the same queries for one record or a whole batch."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.patient = cls.env['res.partner'].create({'name': 'History Patient'})
+        cls.medicines = cls.env['doctor.medicines'].create([
+            {'medicine_name': 'Medicine %s' % letter} for letter in 'ABC'
+        ])
+        cls.appointments = cls.env['doctor.appointments'].create([{
+            'patient_id': cls.patient.id,
+            'reference_id': 'HIST-0001',
+            'appointment_date': date(2024, 1, 1) + timedelta(days=30 * index),
+            'medicine_line_ids': [Command.create({'medicine_id': medicine.id}) for medicine in cls.medicines],
+        } for index in range(12)])
+
+    def _reset(self, fnames):
+        self.env.flush_all()
+        self.appointments.invalidate_recordset(fnames + ['patient_id', 'appointment_date'])
+        self.appointments._invalidate_history_cache()
+
+    def _count_queries(self, records, fnames):
+        """Return the queries needed to compute ``fnames`` on ``records`` from a cold cache."""
+        self._reset(fnames)
+        start = self.env.cr.sql_log_count
+        for fname in fnames:
+            records.mapped(fname)
+        return self.env.cr.sql_log_count - start
+
+    def _assert_batch_query_count(self, fnames):
+        expected = self._count_queries(self.appointments[:1], fnames)
+        self._reset(fnames)
+        with self.assertQueryCount(expected):
+            for fname in fnames:
+                self.appointments.mapped(fname)
+
+    def test_history_computes_share_one_load(self):
+        fnames = ['previous_complaints_ids', 'last_history_id', 'patient_type']
+        self._assert_batch_query_count(fnames)
+        # The second and third compute reuse the history loaded by the first
+        self.assertEqual(
+            self._count_queries(self.appointments, fnames),
+            self._count_queries(self.appointments, fnames[:1]),
+        )
+        last = self.appointments.sorted('appointment_date')[-1]
+        self.assertEqual(len(last.previous_complaints_ids), 11)
+        self.assertEqual(last.last_history_id, self.appointments.sorted('appointment_date')[-2])
+
+    def test_previous_medicines_bounded_query(self):
+        with patch.object(type(self.appointments), 'PREVIOUS_MEDICINES_PAGE', 4):
+            self._assert_batch_query_count(['previous_medicine_line_ids'])
+            appointments = self.appointments.sorted('appointment_date')
+            self.assertFalse(appointments[0].previous_medicine_line_ids)
+            self.assertEqual(len(appointments[1].previous_medicine_line_ids), 3)
+            latest = appointments[-1].previous_medicine_line_ids
+            self.assertEqual(len(latest), 4)
+            self.assertEqual(latest.appointment_id, appointments[-2] | appointments[-3])
+
+    def test_history_text_bounded_query(self):
+        self._assert_batch_query_count(['previous_complaints_text'])
+
+
+@tagged('post_install', '-at_install')
+class TestHistoryComputes(TransactionCase):
+    """Each history compute costs a fixed number of queries for appointments of several patients."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.patients = cls.env['res.partner'].create([{'name': 'Patient %s' % index} for index in range(3)])
+        cls.medicines = cls.env['doctor.medicines'].create([
+            {'medicine_name': 'Compute Medicine %s' % letter} for letter in 'AB'
+        ])
+        # The patients' visits interleave: visit n of patient p is on day 3 * n + p
+        cls.appointments = cls.env['doctor.appointments'].create([{
+            'patient_id': patient.id,
+            'reference_id': 'COMP-%04d' % patient.id,
+            'appointment_date': date(2024, 1, 1) + timedelta(days=3 * visit + index),
+            'chief_complaint': 'Complaint %s of %s' % (visit, patient.name),
+            'medicine_line_ids': [Command.create({'medicine_id': medicine.id}) for medicine in cls.medicines],
+        } for visit in range(5) for index, patient in enumerate(cls.patients)])
+
+    def _past(self, appointment):
+        """Hand-built history: the patient's appointments before ``appointment``, latest first."""
+        return self.appointments.filtered(
+            lambda other: other.patient_id == appointment.patient_id
+            and other.appointment_date < appointment.appointment_date
+        ).sorted('appointment_date', reverse=True)
+
+    def _prepare(self, records, fname):
+        """Start from a cold history with ``fname`` due on ``records`` and their key fields in cache."""
+        self.env.flush_all()
+        self.appointments.invalidate_recordset()
+        self.appointments._invalidate_history_cache()
+        records.fetch(['patient_id', 'appointment_date', 'booking_id'])
+        field = records._fields[fname]
+        if field.store:
+            self.env.add_to_compute(field, records)
+
+    def _assert_constant_query_count(self, fname):
+        single = self.appointments[-1:]
+        self._prepare(single, fname)
+        start = self.env.cr.sql_log_count
+        single.mapped(fname)
+        expected = self.env.cr.sql_log_count - start
+        self.assertTrue(expected, "%s must be computed from the database" % fname)
+
+        self._prepare(self.appointments, fname)
+        with self.assertQueryCount(expected):
+            self.appointments.mapped(fname)
+
+    def test_patient_type(self):
+        self._assert_constant_query_count('patient_type')
+        with_stats = 'appointment.patient.stats' in self.env
+        for appointment in self.appointments:
+            # Without the consultations statistics, any other visit of the patient makes them old
+            earlier = self._past(appointment) if with_stats else self.appointments.filtered(
+                lambda other: other.patient_id == appointment.patient_id and other != appointment)
+            self.assertEqual(appointment.patient_type, 'old' if earlier else 'new')
+
+    def test_previous_complaints_text(self):
+        with patch.object(type(self.appointments), 'HISTORY_PAGE', 3):
+            self._assert_constant_query_count('previous_complaints_text')
+            for appointment in self.appointments:
+                past = self._past(appointment)
+                text = str(appointment.previous_complaints_text or '')
+                # The latest three visits, latest first, then the pointer to the older ones
+                positions = [text.find(visit.chief_complaint) for visit in past[:3]]
+                self.assertEqual(positions, sorted(positions))
+                self.assertNotIn(-1, positions)
+                for visit in past[3:] | appointment:
+                    self.assertNotIn(visit.chief_complaint, text)
+                self.assertEqual('Load Older History' in text, len(past) > 3)
+
+    def test_previous_medicine_lines(self):
+        with patch.object(type(self.appointments), 'PREVIOUS_MEDICINES_PAGE', 3):
+            self._assert_constant_query_count('previous_medicine_line_ids')
+            for appointment in self.appointments:
+                expected = self._past(appointment).medicine_line_ids.sorted(
+                    lambda line: (line.prescription_date, line.id), reverse=True)[:3]
+                self.assertEqual(appointment.previous_medicine_line_ids, expected)
+
+    def test_computes_share_one_history_load(self):
+        self._prepare(self.appointments, 'patient_type')
+        self.appointments.mapped('patient_type')
+        # The history loaded for the patient type serves the other history computes
+        with self.assertQueryCount(0):
+            self.appointments.mapped('previous_complaints_ids')
+            self.appointments.mapped('last_history_id')
+        for appointment in self.appointments:
+            past = self._past(appointment)
+            self.assertEqual(appointment.previous_complaints_ids, past)
+            self.assertEqual(appointment.last_history_id, past[:1])
@@ -16,7 +16,7 @@ Taf Data
     # Check https://github.com/odoo/odoo/blob/15.0/odoo/addons/base/data/ir_module_category_data.xml
     # for the full list
     'category': 'HealtCare',
-    'version': '0.1',
+    'version': '0.2',
 
     # any module necessary for this one to work correctly
     'depends': ['base', 'contacts'],
@@ -24,9 +24,14 @@ Taf Data
     # always loaded
     'data': [
         'security/ir.model.access.csv',
+        'data/taf_cron.xml',
+        'data/taf_hospital_data.xml',
         'views/views.xml',
         'views/templates.xml',
         'views/taf_booking_view.xml',
+        'views/taf_status_outbox_view.xml',
+        'views/taf_hospital_view.xml',
+        'views/taf_webhook_event_view.xml',
         'views/menu_items.xml',
     ],
     # only loaded in demonstration mode
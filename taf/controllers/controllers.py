@@ -1,22 +1,51 @@
 # -*- coding: utf-8 -*-
-# from odoo import http
+import hashlib
+import hmac
+import json
+import logging
 
+from odoo import http
+from odoo.http import request
 
-# class Taf(http.Controller):
-#     @http.route('/taf/taf', auth='public')
-#     def index(self, **kw):
-#         return "Hello, world"
+_logger = logging.getLogger(__name__)
 
-#     @http.route('/taf/taf/objects', auth='public')
-#     def list(self, **kw):
-#         return http.request.render('taf.listing', {
-#             'root': '/taf/taf',
-#             'objects': http.request.env['taf.taf'].search([]),
-#         })
 
-#     @http.route('/taf/taf/objects/<model("taf.taf"):obj>', auth='public')
-#     def object(self, obj, **kw):
-#         return http.request.render('taf.object', {
-#             'object': obj
-#         })
+class TafWebhook(http.Controller):
 
+    def _json_response(self, body, status=200):
+        return request.make_response(json.dumps(body), headers=[('Content-Type', 'application/json')], status=status)
+
+    def _check_signature(self, body):
+        """Verify the ``X-TAF-Signature: sha256=<hex>`` HMAC of the raw body with the shared secret."""
+        secret = request.env['ir.config_parameter'].sudo().get_param('taf.webhook_secret')
+        if not secret:
+            return False
+        expected = 'sha256=' + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+        return hmac.compare_digest(expected, request.httprequest.headers.get('X-TAF-Signature', ''))
+
+    @http.route('/taf/webhook/appointments', type='http', auth='none', methods=['POST'], csrf=False, save_session=False)
+    def appointment_events(self, **kw):
+        """Receive one appointment/status event, a list of them, or ``{"events": [...]}``.
+
+        Valid events are queued as ``taf.webhook.event`` rows and applied by a
+        cron through the same bulk upsert as the polling sync.
+        """
+        body = request.httprequest.get_data()
+        if not self._check_signature(body):
+            return self._json_response({'success': False, 'message': 'Invalid signature'}, status=401)
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return self._json_response({'success': False, 'message': 'Invalid JSON'}, status=400)
+
+        if isinstance(data, dict):
+            events = data['events'] if isinstance(data.get('events'), list) else [data]
+        elif isinstance(data, list):
+            events = data
+        else:
+            return self._json_response({'success': False, 'message': 'Expected an event or a list of events'}, status=400)
+
+        accepted, rejected = request.env['taf.webhook.event'].sudo()._enqueue_events(events)
+        _logger.info("TAF webhook: queued %d events, rejected %d.", accepted, rejected)
+        return self._json_response({'success': not rejected, 'accepted': accepted, 'rejected': rejected},
+                                   status=202 if accepted or not rejected else 400)
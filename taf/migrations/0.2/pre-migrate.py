@@ -0,0 +1,73 @@
+"""Resolve the duplicate TAF keys before their unique constraints are added.
+
+* ``taf_bookings.appointment_id``: the most recently written booking of each
+  TAF appointment is kept; the outbox entries of the others move to it
+  before they are deleted.
+* ``res_partner.x_taf``: the contact with the lowest id keeps the TAF user;
+  the bookings of the other contacts move to it and their ``x_taf`` is
+  cleared. The contacts themselves are kept, as other records may use them.
+"""
+import logging
+
+from odoo.tools import sql
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    if not version:
+        return
+    if sql.table_exists(cr, 'taf_bookings'):
+        _merge_bookings(cr)
+    if sql.column_exists(cr, 'res_partner', 'x_taf'):
+        _unlink_duplicate_partners(cr)
+
+
+def _merge_bookings(cr):
+    cr.execute("""
+        CREATE TEMP TABLE taf_booking_merge ON COMMIT DROP AS
+        SELECT id AS duplicate_id,
+               FIRST_VALUE(id) OVER (
+                   PARTITION BY appointment_id ORDER BY write_date DESC NULLS LAST, id DESC
+               ) AS survivor_id
+          FROM taf_bookings
+         WHERE appointment_id IS NOT NULL
+    """)
+    cr.execute("DELETE FROM taf_booking_merge WHERE duplicate_id = survivor_id")
+    if not _rows(cr, 'taf_booking_merge'):
+        return
+    if sql.table_exists(cr, 'taf_status_outbox'):
+        cr.execute("""
+            UPDATE taf_status_outbox entry SET booking_id = merge.survivor_id
+              FROM taf_booking_merge merge
+             WHERE entry.booking_id = merge.duplicate_id
+        """)
+    cr.execute("DELETE FROM taf_bookings WHERE id IN (SELECT duplicate_id FROM taf_booking_merge)")
+    _logger.info("🧹 Merged %d duplicate TAF bookings before adding the appointment_id key.", cr.rowcount)
+
+
+def _unlink_duplicate_partners(cr):
+    cr.execute("""
+        CREATE TEMP TABLE taf_partner_merge ON COMMIT DROP AS
+        SELECT id AS duplicate_id, MIN(id) OVER (PARTITION BY x_taf) AS survivor_id
+          FROM res_partner
+         WHERE x_taf IS NOT NULL
+    """)
+    cr.execute("DELETE FROM taf_partner_merge WHERE duplicate_id = survivor_id")
+    if not _rows(cr, 'taf_partner_merge'):
+        return
+    if sql.table_exists(cr, 'taf_bookings'):
+        for column in ('user_id', 'res_partner_id'):
+            if sql.column_exists(cr, 'taf_bookings', column):
+                cr.execute("""
+                    UPDATE taf_bookings booking SET {column} = merge.survivor_id
+                      FROM taf_partner_merge merge
+                     WHERE booking.{column} = merge.duplicate_id
+                """.format(column=column))
+    cr.execute("UPDATE res_partner SET x_taf = NULL WHERE id IN (SELECT duplicate_id FROM taf_partner_merge)")
+    _logger.info("🧹 Unlinked %d duplicate contacts from their TAF user before adding the x_taf key.", cr.rowcount)
+
+
+def _rows(cr, table):
+    cr.execute("SELECT 1 FROM %s LIMIT 1" % table)
+    return bool(cr.rowcount)
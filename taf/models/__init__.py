@@ -2,3 +2,7 @@
 
 from . import models
 from . import taf_bookings
+from . import taf_sync_checkpoint
+from . import taf_status_outbox
+from . import taf_hospital
+from . import taf_webhook_event
@@ -1,14 +1,30 @@
+import hashlib
+import json
+import queue
 import requests
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from odoo import models, fields, api
+from odoo.tools import split_every
+from psycopg2.errors import UniqueViolation
 from datetime import datetime, timezone
 
+from ..tools.http_pool import get_session
+from ..tools.json_stream import iter_json_array
+
 _logger = logging.getLogger(__name__)
 
 class ResPartner(models.Model):
     _inherit = 'res.partner'
 
-    x_taf = fields.Char(string="XTaf ID", help="Stores the user ID from the external API")
+    x_taf = fields.Char(string="XTaf ID", copy=False, help="Stores the user ID from the external API")
+
+    # The unique index also serves the x_taf lookups of the sync
+    _sql_constraints = [
+        ('x_taf_uniq', 'unique(x_taf)', 'Another contact is already linked to this TAF user.'),
+    ]
 
 class TafBookings(models.Model):
     _name = 'taf.bookings'
@@ -30,8 +46,15 @@ class TafBookings(models.Model):
     ], string="Status", required=True, default="pending")
 
     booking_date = fields.Datetime(string="Booking Date")
-    appointment_id = fields.Char(string="Appointment ID")
+    appointment_id = fields.Char(string="Appointment ID", copy=False)
     res_partner_id = fields.Many2one('res.partner', string="Related Contact")
+    payload_digest = fields.Char(string="Payload Digest", copy=False,
+                                 help="Digest of the last API payload stored on this booking.")
+
+    # Conflict target of the native upsert in _bulk_upsert_bookings
+    _sql_constraints = [
+        ('appointment_id_uniq', 'unique(appointment_id)', 'This TAF appointment has already been imported.'),
+    ]
 
     STATUS_MAPPING = {
         'pending': 'Pending',
@@ -39,6 +62,24 @@ class TafBookings(models.Model):
         'completed': 'Completed',
         'cancelled': 'Cancelled'
     }
+    API_STATUS_MAPPING = {value.lower(): key for key, value in STATUS_MAPPING.items()}
+
+    # Default list endpoint; hospitals are configured as taf.hospital records
+    TAF_LIST_URL = "https://thinkayurvedafirst-v4s5vamnea-el.a.run.app/api/appointment/list"
+    TAF_STATUS_URL = "https://app-2rldzj3zza-el.a.run.app/api/appointment/{appointment_id}"
+
+    # Number of API items resolved and created per bulk upsert (and per commit)
+    UPSERT_BATCH_SIZE = 1000
+    # Page size requested from the API; one page is one committed chunk
+    SYNC_PAGE_SIZE = UPSERT_BATCH_SIZE
+    # Columns written by the native upsert of API bookings
+    UPSERT_COLUMNS = (
+        'appointment_id', 'user_id', 'res_partner_id', 'x_taf', 'patient_name', 'email', 'phone', 'dob',
+        'age', 'health_concerns', 'status', 'doctor_name', 'booking_date', 'payload_digest',
+    )
+    # Hospitals fetched at the same time (and pooled connections to the API)
+    MAX_PARALLEL_HOSPITALS = 4
+
     # appointment_type = fields.Selection([
     #     ('in-clinic', 'In-Clinic'),
     #     ('videoconsult', 'Video Consultation')
@@ -49,27 +90,37 @@ class TafBookings(models.Model):
   
 
 
-    @api.model
-    def create(self, vals):
-        """Create a new TafBookings record and automatically create an Appointment Booking"""
-        record = super(TafBookings, self).create(vals)
-
-        if record.patient_name and record.email and record.phone:
-            self.env['appointment.booking'].create({
-                'name': record.patient_name,
-                'email': record.email,
-                'phone': record.phone,
-                'appointment_date': record.booking_date or fields.Date.today(),
-                'patient_id': record.user_id.id,
-                'state': 'booked',
-                'reference_id': f'TAF-{record.user_id.id}',
-            })
-            _logger.info("✅ Automatically created appointment.booking record for: %s", record.patient_name)
-
-        return record
+    @api.model_create_multi
+    def create(self, vals_list):
+        """Create new TafBookings records and automatically create their Appointment Bookings"""
+        records = super(TafBookings, self).create(vals_list)
+        records._create_appointment_bookings()
+        return records
+
+    def _create_appointment_bookings(self):
+        """Create the Appointment Booking of each new TAF booking in one batch."""
+        # appointment.booking comes from the consultations module, which taf does not depend on
+        if 'appointment.booking' not in self.env:
+            return
+        appointment_vals = [{
+            'name': record.patient_name,
+            'email': record.email,
+            'phone': record.phone,
+            'appointment_date': record.booking_date or fields.Date.today(),
+            'patient_id': record.user_id.id,
+            'state': 'booked',
+            'reference_id': f'TAF-{record.user_id.id}',
+        } for record in self if record.patient_name and record.email and record.phone]
+
+        if appointment_vals:
+            self.env['appointment.booking'].create(appointment_vals)
+            _logger.info("✅ Automatically created %d appointment.booking records.", len(appointment_vals))
 
     def write(self, vals):
-        """Update status in the external API only if it changes"""
+        """Queue the status update for the external API for every booking whose status changes.
+
+        Pass ``taf_skip_push`` in the context for changes that come from the API itself.
+        """
         if 'status' in vals:
             new_status = vals['status']
 
@@ -78,128 +129,381 @@ class TafBookings(models.Model):
                 _logger.error("❌ Invalid status value attempted: %s", new_status)
                 return False  # Prevent invalid values from being saved
 
-            for record in self:
-                old_status = record.status
-                appointment_id = record.appointment_id  
-
-                if new_status != old_status and appointment_id:
-                    _logger.info("🔄 Status change detected for Appointment ID %s: %s ➝ %s", 
-                                 appointment_id, old_status, new_status)
-
-                    # Update Odoo record first
-                    result = super(TafBookings, self).write(vals)
+            # Diff the whole recordset before the write overwrites the old values
+            changed = self.filtered(lambda record: record.status != new_status and record.appointment_id)
+            result = super(TafBookings, self).write(vals)
 
-                    # Sync change to API
-                    self.update_appointment_status_api(appointment_id, new_status)
-                    return result
+            if changed and not self.env.context.get('taf_skip_push'):
+                _logger.info("🔄 Status change to %s detected for %d appointments.", new_status, len(changed))
+                # Queue the changes in the same transaction and wake the outbox cron,
+                # which sends them concurrently through its bounded thread pool
+                self.env['taf.status.outbox']._enqueue(changed, new_status)
+                cron = self.env.ref('taf.ir_cron_taf_status_outbox', raise_if_not_found=False)
+                if cron:
+                    cron._trigger()
+            return result
 
         return super(TafBookings, self).write(vals)
 
     def update_appointment_status_api(self, appointment_id, status):
         """Send a PUT request to update the appointment status for a specific record"""
-        api_url = f"https://app-2rldzj3zza-el.a.run.app/api/appointment/{appointment_id}"
+        api_status = self.STATUS_MAPPING.get(status, 'Pending')
+        error = self._put_status(get_session(), self._get_api_url('status'), appointment_id, api_status)
+        return error is None
+
+    @api.model
+    def _get_api_url(self, endpoint):
+        """Return the URL of the TAF ``endpoint`` ('list' or 'status').
+
+        The ``taf.api_list_url`` and ``taf.api_status_url`` system parameters
+        override the defaults, e.g. to point the sync at a local mock server.
+        """
+        defaults = {'list': self.TAF_LIST_URL, 'status': self.TAF_STATUS_URL}
+        return self.env['ir.config_parameter'].sudo().get_param('taf.api_%s_url' % endpoint, defaults[endpoint])
+
+    @api.model
+    def _put_status(self, session, status_url, appointment_id, api_status):
+        """PUT one status to the API. Thread-safe: does not touch the ORM.
+
+        :param status_url: URL template from ``_get_api_url('status')``
+        :return: ``None`` on success, otherwise the error message
+        """
+        api_url = status_url.format(appointment_id=appointment_id)
         headers = {
             "Authorization": "YOUR_API_TOKEN_HERE",
             "Content-Type": "application/json"
         }
 
-        api_status = self.STATUS_MAPPING.get(status, 'Pending')
-
         payload = {"status": api_status}
         try:
-            response = requests.put(api_url, json=payload, headers=headers, timeout=10)
-            if response.status_code == 200:
-                _logger.info("✅ Successfully updated Appointment ID %s to status: %s", appointment_id, api_status)
-            else:
-                _logger.error("❌ API Error for Appointment ID %s: %s", appointment_id, response.text)
+            response = session.put(api_url, json=payload, headers=headers, timeout=10)
         except requests.RequestException as e:
             _logger.error("⚠️ Network error while updating Appointment ID %s: %s", appointment_id, str(e))
+            return str(e)
+        if response.status_code == 200:
+            _logger.info("✅ Successfully updated Appointment ID %s to status: %s", appointment_id, api_status)
+            return None
+        _logger.error("❌ API Error for Appointment ID %s: %s", appointment_id, response.text)
+        return "HTTP %s: %s" % (response.status_code, response.text[:500])
 
     @api.model
-    def fetch_and_store_users(self):
-        """Fetch and store user data from API"""
+    def fetch_and_store_users(self, full_sync=False):
+        """Fetch and store user data from API for every active hospital.
+
+        The hospitals' list endpoints are streamed in parallel over one pooled
+        keep-alive session. Only appointments newer than each hospital's
+        checkpoint are requested, page by page. Worker threads only parse the
+        responses; their items are merged on this thread into shared bulk
+        upserts of ``UPSERT_BATCH_SIZE``, committing after every chunk and
+        page so that an interrupted run resumes from the last stored page.
+
+        :param full_sync: ignore the high-water marks and walk the whole history
+        """
         _logger.info("Cron job fetch_and_store_users started.")
-        # url = "https://app-2rldzj3zza-el.a.run.app/api/appointment/list?hospital=673591b50b5b714013233be5"
-        url="https://thinkayurvedafirst-v4s5vamnea-el.a.run.app/api/appointment/list?hospital=675c154a859d541a0b0aef7f"
+        hospitals = self.env['taf.hospital'].search([])
+        if not hospitals:
+            _logger.warning("⚠️ No active TAF hospital configured, nothing to fetch.")
+            return "No hospital configured."
+
+        Checkpoint = self.env['taf.sync.checkpoint']
+        default_url = self._get_api_url('list')
+        plans = {}
+        for hospital in hospitals:
+            checkpoint = Checkpoint._get_for_hospital(hospital.code)
+            if checkpoint.page_cursor:
+                # Resume the interrupted window where the last committed page left off
+                since = checkpoint.window_since
+                _logger.info("Resuming TAF sync for hospital %s at page %d.", hospital.name, checkpoint.page_cursor)
+            else:
+                since = False if full_sync else checkpoint.last_booking_date
+                checkpoint.write({'window_since': since, 'page_cursor': 1})
+            plans[hospital.code] = {
+                'name': hospital.name,
+                'url': hospital.list_url or default_url,
+                'since': since,
+                'page': checkpoint.page_cursor,
+                'checkpoint': checkpoint,
+                'high_water': checkpoint.last_booking_date,
+                'count': 0,
+            }
+        self._commit_sync_chunk()
+
+        messages = queue.Queue(maxsize=2 * len(plans))
+        stop = threading.Event()
+        session = get_session(self.MAX_PARALLEL_HOSPITALS)
+        buffer = []
+        failed = []
+
+        def flush():
+            if buffer:
+                self._bulk_upsert_bookings(buffer)
+                buffer.clear()
+                self._commit_sync_chunk()
+
+        with ThreadPoolExecutor(max_workers=self.MAX_PARALLEL_HOSPITALS) as executor:
+            for code, plan in plans.items():
+                executor.submit(self._stream_hospital, session, code, plan['url'], plan['since'],
+                                plan['page'], messages, stop)
+            running = len(plans)
+            try:
+                while running:
+                    kind, code, payload = messages.get()
+                    plan = plans[code]
+                    if kind == 'items':
+                        plan['count'] += len(payload)
+                        plan['high_water'] = max(filter(None, [plan['high_water'], *map(self._item_timestamp, payload)]), default=False)
+                        buffer.extend(payload)
+                        if len(buffer) >= self.UPSERT_BATCH_SIZE:
+                            flush()
+                    elif kind == 'page':
+                        # Every item of the page is stored before its cursor moves on
+                        flush()
+                        plan['checkpoint'].page_cursor = payload + 1
+                        self._commit_sync_chunk()
+                    else:
+                        running -= 1
+                        error, elapsed = payload
+                        if error:
+                            failed.append(code)
+                            _logger.error("❌ Request error for hospital %s: %s", plan['name'], error)
+                        else:
+                            _logger.info("✅ Fetched %d records from hospital %s in %.2fs.",
+                                         plan['count'], plan['name'], elapsed)
+                flush()
+            finally:
+                stop.set()
+
+        now = fields.Datetime.now()
+        for code, plan in plans.items():
+            if code in failed:
+                continue
+            plan['checkpoint'].write({
+                'last_booking_date': plan['high_water'],
+                'window_since': False,
+                'page_cursor': 0,
+                'last_run': now,
+                'records_synced': plan['count'],
+            })
+        self._commit_sync_chunk()
 
-        try:
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-        except requests.RequestException as e:
-            _logger.error("❌ Request error: %s", str(e))
-            return "Failed to fetch user data due to network issues."
-
-        data = response.json()
-        users = data.get("result", [])
-        _logger.info("✅ Fetched %d records.", len(users))
-
-        status_mapping = {
-            'Pending': 'pending',
-            'Confirmed': 'confirmed',
-            'Completed': 'completed',
-            'Cancelled': 'cancelled'
-        }
+        _logger.info("✅ Fetched %d records from %d hospitals.", sum(plan['count'] for plan in plans.values()), len(plans))
+        if failed:
+            return "Failed to fetch user data for %s due to network issues." % ', '.join(plans[code]['name'] for code in failed)
+        return "User data fetched and stored successfully!"
 
-        for item in users:
-            user_data = item.get("user", {})
-            appointment_id = item.get('_id')
-            booking_timestamp = item.get('bookingDate')
-            health_concerns = ', '.join(item.get('healthConcerns', []))
-            api_status = item.get('status', '').lower()
-            # appointment_type = item.get('type', 'in-clinic')  # Default to 'in-clinic'
-            doctor_name = item.get("name", "")  # Doctor Name
+    @api.model
+    def _stream_hospital(self, session, hospital, url, since, page, messages, stop):
+        """Stream the pages of one hospital into ``messages``. Runs in a worker thread: no ORM access.
+
+        Posts ``('items', hospital, [...])`` per parsed chunk, ``('page', hospital, page)``
+        after each complete page and finally ``('done', hospital, (error, seconds))``.
+
+        Paging assumes the API honours ``page``/``limit``: a short page is the
+        last one. An API returning more than ``limit`` items, or the same items
+        again, ignores them, so the stream stops there instead of looping.
+        """
+        started = time.monotonic()
+
+        def post(message):
+            while not stop.is_set():
+                try:
+                    messages.put(message, timeout=1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        error = None
+        previous_ids = None
+        try:
+            while True:
+                params = {'hospital': hospital, 'page': page, 'limit': self.SYNC_PAGE_SIZE}
+                if since:
+                    params['since'] = int(since.replace(tzinfo=timezone.utc).timestamp() * 1000)
+                page_count = 0
+                page_ids = set()
+                with session.get(url, params=params, timeout=30, stream=True) as response:
+                    response.raise_for_status()
+                    items = iter_json_array(response.iter_content(chunk_size=65536), 'result')
+                    for chunk in split_every(self.UPSERT_BATCH_SIZE, items, list):
+                        page_count += len(chunk)
+                        page_ids.update(item.get('_id') for item in chunk)
+                        if not post(('items', hospital, chunk)):
+                            return
+                if page_ids and page_ids == previous_ids:
+                    _logger.warning("⚠️ TAF API returned page %d of hospital %s again, ignoring paging; stopping.",
+                                    page, hospital)
+                    break
+                if not post(('page', hospital, page)):
+                    return
+                if page_count > self.SYNC_PAGE_SIZE:
+                    _logger.warning("⚠️ TAF API returned %d items for a page of %d for hospital %s, ignoring paging; "
+                                    "stopping after this page.", page_count, self.SYNC_PAGE_SIZE, hospital)
+                    break
+                if page_count < self.SYNC_PAGE_SIZE:
+                    break
+                previous_ids = page_ids
+                page += 1
+        except Exception as e:  # reported to the consuming thread, which logs it
+            error = str(e)
+        post(('done', hospital, (error, time.monotonic() - started)))
 
-            # video_call_link = item.get("videoCallLink", '') if appointment_type == "videoconsult" else ''
+    @api.model
+    def _item_timestamp(self, item):
+        """Return the update (or booking) time of an API item as a naive UTC datetime."""
+        timestamp = item.get('updatedAt') or item.get('bookingDate')
+        if not isinstance(timestamp, (int, float)):
+            return False
+        return datetime.fromtimestamp(timestamp / 1000, tz=timezone.utc).replace(tzinfo=None)
+
+    def _commit_sync_chunk(self):
+        """Commit the stored chunk, except inside tests or when ``taf_sync_no_commit`` is in the context."""
+        if not (getattr(threading.current_thread(), 'testing', False) or self.env.context.get('taf_sync_no_commit')):
+            self.env.cr.commit()
 
+    @api.model
+    def _parse_api_item(self, item):
+        """Normalize one appointment from the API into partner and booking values.
+
+        Returns ``None`` when the item cannot be stored (no user or user ``_id``).
+        """
+        user_data = item.get("user", {})
+        if not user_data:
+            return None
+
+        api_user_id = user_data.get('_id')
+        if not api_user_id:
+            _logger.warning("⚠️ Missing _id in user data, skipping record.")
+            return None
+
+        booking_timestamp = item.get('bookingDate')
+        api_status = item.get('status', '').lower()
+        full_name = f"{user_data.get('firstName', '')} {user_data.get('lastName', '')}".strip()
+        phone = str(user_data.get('phoneNumber', '')) if user_data.get('phoneNumber') else False
+
+        booking_vals = {
+            'x_taf': api_user_id,
+            'patient_name': full_name,
+            'email': user_data.get('email'),
+            'phone': phone,
+            'dob': datetime.fromtimestamp(user_data.get('dob') / 1000).replace(tzinfo=None) if user_data.get('dob') else False,
+            'age': user_data.get('age'),
+            'health_concerns': ', '.join(item.get('healthConcerns', [])),
+            'status': self.API_STATUS_MAPPING.get(api_status, 'pending'),
+            'doctor_name': item.get("name", ""),  # Doctor Name
+            'booking_date': datetime.fromtimestamp(booking_timestamp / 1000).replace(tzinfo=None) if booking_timestamp else False,
+            'appointment_id': item.get('_id'),
+        }
+        booking_vals['payload_digest'] = self._payload_digest(booking_vals)
+
+        return {
+            'x_taf': api_user_id,
+            'partner': {
+                'name': full_name,
+                'email': user_data.get('email'),
+                'phone': phone,
+                'customer_rank': 1,
+                'is_company': False,
+                'x_taf': api_user_id,
+            },
+            'booking': booking_vals,
+        }
 
-            status = status_mapping.get(api_status, "pending")
+    @api.model
+    def _payload_digest(self, booking_vals):
+        """Return a stable digest of normalized booking values, used to skip unchanged rows."""
+        payload = json.dumps(booking_vals, sort_keys=True, default=str, separators=(',', ':'))
+        return hashlib.sha1(payload.encode()).hexdigest()
 
-            if not user_data:
+    @api.model
+    def _bulk_upsert_bookings(self, items):
+        """Store a batch of API appointments with a fixed number of queries.
+
+        All incoming ``x_taf`` ids are resolved with one search and the
+        missing partners created with one multi-record ``create()``. Bookings
+        are then upserted with a single ``INSERT ... ON CONFLICT
+        (appointment_id)`` statement that only rewrites rows whose payload
+        digest changed, which is also safe when two sync workers overlap.
+        """
+        parsed = [vals for vals in map(self._parse_api_item, items) if vals]
+        if not parsed:
+            return 0
+
+        partner_by_taf = self._resolve_partners(parsed)
+
+        # Last occurrence wins: a row may only be upserted once per statement
+        rows = {}
+        for vals in parsed:
+            booking = vals['booking']
+            if not booking['appointment_id']:
+                _logger.warning("⚠️ Missing appointment _id for user %s, skipping record.", vals['x_taf'])
                 continue
+            partner_id = partner_by_taf[vals['x_taf']]
+            rows[booking['appointment_id']] = dict(booking, user_id=partner_id, res_partner_id=partner_id)
+        if not rows:
+            return 0
+
+        now = fields.Datetime.now()
+        columns = self.UPSERT_COLUMNS + ('create_uid', 'create_date', 'write_uid', 'write_date')
+        values = [
+            tuple(None if row[column] is False else row[column] for column in self.UPSERT_COLUMNS)
+            + (self.env.uid, now, self.env.uid, now)
+            for row in rows.values()
+        ]
+        self.flush_model()
+        self.env.cr.execute("""
+            INSERT INTO taf_bookings (%s) VALUES %s
+            ON CONFLICT (appointment_id) DO UPDATE SET %s
+             WHERE taf_bookings.payload_digest IS DISTINCT FROM EXCLUDED.payload_digest
+            RETURNING id, (xmax = 0)
+        """ % (
+            ', '.join(columns),
+            ', '.join(['%s'] * len(values)),
+            ', '.join('%s = EXCLUDED.%s' % (column, column)
+                      for column in self.UPSERT_COLUMNS + ('write_uid', 'write_date')
+                      if column != 'appointment_id'),
+        ), values)
+        result = self.env.cr.fetchall()
+        self.invalidate_model()
+
+        created = self.browse(row_id for row_id, inserted in result if inserted)
+        if created:
+            created._create_appointment_bookings()
+            _logger.info("✅ Created %d taf.bookings records.", len(created))
+        updated = len(result) - len(created)
+        if updated:
+            _logger.info("✅ Updated %d changed taf.bookings records.", updated)
+
+        return len(result)
 
-            api_user_id = user_data.get('_id')
-            if not api_user_id:
-                _logger.warning("⚠️ Missing _id in user data, skipping record.")
+    @api.model
+    def _resolve_partners(self, parsed):
+        """Return ``{x_taf: partner_id}`` for parsed items, creating missing partners in one batch.
+
+        If a concurrent worker creates one of the same partners first, the
+        unique ``x_taf`` key rejects the batch and the ids are resolved again.
+        """
+        Partner = self.env['res.partner']
+        taf_ids = list({vals['x_taf'] for vals in parsed})
+        for attempt in range(2):
+            partner_by_taf = {}
+            for partner in Partner.search_fetch([('x_taf', 'in', taf_ids)], ['x_taf']):
+                partner_by_taf.setdefault(partner.x_taf, partner.id)
+
+            new_partner_vals = {}
+            for vals in parsed:
+                if vals['x_taf'] not in partner_by_taf:
+                    new_partner_vals.setdefault(vals['x_taf'], vals['partner'])
+            if not new_partner_vals:
+                return partner_by_taf
+            try:
+                with self.env.cr.savepoint():
+                    new_partners = Partner.create(list(new_partner_vals.values()))
+            except UniqueViolation:
+                if attempt:
+                    raise
+                _logger.info("Partners created concurrently by another worker, resolving them again.")
                 continue
-
-            partner = self.env['res.partner'].search([('x_taf', '=', api_user_id)], limit=1)
-            if not partner:
-                partner = self.env['res.partner'].create({
-                    'name': f"{user_data.get('firstName', '')} {user_data.get('lastName', '')}".strip(),
-                    'email': user_data.get('email'),
-                    'phone': str(user_data.get('phoneNumber', '')) if user_data.get('phoneNumber') else False,
-                    'customer_rank': 1,
-                    'is_company': False,
-                    'x_taf': api_user_id,
-                })
-                _logger.info("✅ Created new res.partner record: %s", user_data.get('email'))
-
-            dob_datetime = datetime.fromtimestamp(user_data.get('dob') / 1000).replace(tzinfo=None) if user_data.get('dob') else False
-            booking_datetime = datetime.fromtimestamp(booking_timestamp / 1000).replace(tzinfo=None) if booking_timestamp else False
-
-            booking = self.env['taf.bookings'].search([
-                ('user_id', '=', partner.id), 
-                ('appointment_id', '=', appointment_id)
-            ], limit=1)
-
-            if not booking:
-                self.env['taf.bookings'].create({
-                    'user_id': partner.id,
-                    'x_taf': api_user_id,
-                    'patient_name': f"{user_data.get('firstName', '')} {user_data.get('lastName', '')}".strip(),
-                    'email': user_data.get('email'),
-                    'phone': str(user_data.get('phoneNumber', '')) if user_data.get('phoneNumber') else False,
-                    'dob': dob_datetime,
-                    'age': user_data.get('age'),
-                    'health_concerns': health_concerns,
-                    'status': status,
-                    # 'appointment_type': appointment_type, 
-                    'doctor_name': doctor_name, 
-                    # 'video_call_link': video_call_link,
-                    'booking_date': booking_datetime,
-                    'appointment_id': appointment_id,
-                    'res_partner_id': partner.id,
-                })
-                _logger.info("✅ Created taf.bookings record for user: %s", user_data.get('email'))
-
-        return "User data fetched and stored successfully!"
+            partner_by_taf.update(zip(new_partner_vals, new_partners.ids))
+            _logger.info("✅ Created %d new res.partner records.", len(new_partners))
+            return partner_by_taf
@@ -0,0 +1,18 @@
+from odoo import models, fields
+
+
+class TafHospital(models.Model):
+    _name = 'taf.hospital'
+    _description = 'TAF Hospital'
+    _order = 'sequence, id'
+
+    name = fields.Char(string="Hospital", required=True)
+    code = fields.Char(string="Hospital ID", required=True, help="Hospital id passed to the TAF appointment list API")
+    list_url = fields.Char(string="List Endpoint",
+                           help="Appointment list URL of this hospital; leave empty to use the default TAF endpoint.")
+    sequence = fields.Integer(default=10)
+    active = fields.Boolean(default=True)
+
+    _sql_constraints = [
+        ('code_uniq', 'unique(code)', 'A hospital with this TAF id already exists.'),
+    ]
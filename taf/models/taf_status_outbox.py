@@ -0,0 +1,170 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import requests
+
+from odoo import models, fields, api
+
+from ..tools.http_pool import get_session
+
+_logger = logging.getLogger(__name__)
+
+
+class TafStatusOutbox(models.Model):
+    _name = 'taf.status.outbox'
+    _description = 'TAF Status Update Outbox'
+    _order = 'id'
+
+    booking_id = fields.Many2one('taf.bookings', string="Booking", ondelete='set null')
+    appointment_id = fields.Char(string="Appointment ID", required=True, index=True)
+    status = fields.Selection([
+        ('pending', 'Pending'),
+        ('confirmed', 'Appointment Booked'),
+        ('completed', 'Consultation Completed'),
+        ('cancelled', 'Cancelled')
+    ], string="Status", required=True)
+    state = fields.Selection([
+        ('pending', 'Waiting'),
+        ('done', 'Delivered'),
+        ('superseded', 'Superseded'),
+        ('failed', 'Failed'),
+    ], string="Delivery State", required=True, default='pending', index=True)
+    attempts = fields.Integer(string="Attempts", default=0)
+    next_attempt_at = fields.Datetime(string="Next Attempt", default=fields.Datetime.now, index=True)
+    last_error = fields.Text(string="Last Error")
+    sent_at = fields.Datetime(string="Delivered At")
+    latency_ms = fields.Integer(string="Delivery Latency (ms)",
+                                help="Time between queuing the update and its delivery to the API.")
+
+    # Rows claimed per drain iteration and concurrent PUT requests in flight
+    BATCH_SIZE = 200
+    MAX_WORKERS = 8
+    # Retry schedule: BACKOFF_BASE * 2 ** (attempts - 1) seconds, capped, until MAX_ATTEMPTS
+    BACKOFF_BASE = 30
+    BACKOFF_MAX = 3600
+    MAX_ATTEMPTS = 8
+    # Stop draining after this many seconds so one cron run stays short
+    TIME_BUDGET = 240
+    # Seconds a claimed batch is hidden from other workers while it is being sent;
+    # longer than sending a full batch, so a crashed worker's rows come back after it
+    CLAIM_LEASE = 600
+
+    @api.model
+    def _enqueue(self, bookings, status):
+        """Queue a status update for ``bookings`` in the current transaction.
+
+        Undelivered older updates of the same appointments are superseded, so
+        one waiting out its backoff can never overwrite the newer status. Rows
+        a worker is claiming right now are skipped instead of waited for: the
+        newer entry makes ``_deliver`` supersede them.
+        """
+        vals_list = [{
+            'booking_id': booking.id,
+            'appointment_id': booking.appointment_id,
+            'status': status,
+        } for booking in bookings if booking.appointment_id]
+        if vals_list:
+            self.flush_model(['appointment_id', 'state'])
+            self.env.cr.execute("""
+                UPDATE taf_status_outbox SET state = 'superseded'
+                 WHERE id IN (SELECT id FROM taf_status_outbox
+                               WHERE appointment_id = ANY(%s) AND state IN ('pending', 'failed')
+                                 FOR UPDATE SKIP LOCKED)
+            """, [[vals['appointment_id'] for vals in vals_list]])
+            self.invalidate_model(['state'])
+        return self.create(vals_list)
+
+    @api.model
+    def _cron_push_status_updates(self):
+        """Drain the outbox: deliver due status updates to the TAF API in concurrent batches."""
+        deadline = time.monotonic() + self.TIME_BUDGET
+        while time.monotonic() < deadline:
+            entries = self._claim_due_entries()
+            if not entries:
+                break
+            self._deliver(entries)
+            self.env['taf.bookings']._commit_sync_chunk()
+            if len(entries) < self.BATCH_SIZE:
+                break
+
+    def _claim_due_entries(self):
+        """Lease a batch of due entries and commit, so no row lock is held while they are sent.
+
+        The lease moves ``next_attempt_at`` past the sending window: other
+        workers skip the batch, and ``_deliver`` sets the real next attempt.
+        """
+        self.flush_model(['state', 'next_attempt_at'])
+        self.env.cr.execute("""
+            UPDATE taf_status_outbox
+               SET next_attempt_at = (now() at time zone 'UTC') + make_interval(secs => %s)
+             WHERE id IN (SELECT id FROM taf_status_outbox
+                           WHERE state = 'pending' AND next_attempt_at <= (now() at time zone 'UTC')
+                           ORDER BY id
+                           LIMIT %s
+                             FOR UPDATE SKIP LOCKED)
+         RETURNING id
+        """, [self.CLAIM_LEASE, self.BATCH_SIZE])
+        entries = self.browse(sorted(row[0] for row in self.env.cr.fetchall()))
+        entries.invalidate_recordset(['next_attempt_at'])
+        self.env['taf.bookings']._commit_sync_chunk()
+        return entries
+
+    def _deliver(self, entries):
+        """Send the latest queued status of each appointment and record the outcome.
+
+        An entry is only sent when no newer entry exists for its appointment,
+        whatever that entry's state, so a late retry cannot overwrite it.
+        """
+        self.flush_model(['appointment_id'])
+        self.env.cr.execute("""
+            SELECT entry.id FROM taf_status_outbox entry
+             WHERE entry.id = ANY(%s)
+               AND EXISTS (SELECT 1 FROM taf_status_outbox newer
+                            WHERE newer.appointment_id = entry.appointment_id AND newer.id > entry.id)
+        """, [entries.ids])
+        superseded = self.browse(row[0] for row in self.env.cr.fetchall())
+        latest = {entry.appointment_id: entry for entry in entries - superseded}
+        superseded.write({'state': 'superseded'})
+        # Record the outcomes in a transaction started after the requests, so
+        # entries superseded by a user meanwhile don't conflict with it
+        self.env['taf.bookings']._commit_sync_chunk()
+
+        TafBookings = self.env['taf.bookings']
+        jobs = [(entry.appointment_id, TafBookings.STATUS_MAPPING.get(entry.status, 'Pending'))
+                for entry in latest.values()]
+        status_url = TafBookings._get_api_url('status')
+        session = get_session(self.MAX_WORKERS)
+        with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
+            # Worker threads only do HTTP; all ORM access stays on this thread.
+            results = list(executor.map(lambda job: TafBookings._put_status(session, status_url, *job), jobs))
+
+        now = fields.Datetime.now()
+        failures = 0
+        for entry, error in zip(latest.values(), results):
+            if error is None:
+                entry.write({
+                    'state': 'done',
+                    'attempts': entry.attempts + 1,
+                    'sent_at': now,
+                    'latency_ms': int((now - entry.create_date).total_seconds() * 1000),
+                    'last_error': False,
+                })
+                continue
+            failures += 1
+            attempts = entry.attempts + 1
+            delay = min(self.BACKOFF_BASE * 2 ** (attempts - 1), self.BACKOFF_MAX)
+            entry.write({
+                'state': 'failed' if attempts >= self.MAX_ATTEMPTS else 'pending',
+                'attempts': attempts,
+                'next_attempt_at': now + timedelta(seconds=delay),
+                'last_error': error,
+            })
+
+        _logger.info("✅ Pushed %d status updates to TAF API (%d failed, %d superseded).",
+                     len(jobs) - failures, failures, len(superseded))
+
+    def action_retry(self):
+        """Re-queue failed entries for immediate delivery."""
+        self.write({'state': 'pending', 'attempts': 0, 'next_attempt_at': fields.Datetime.now()})
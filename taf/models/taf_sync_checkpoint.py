@@ -0,0 +1,30 @@
+from odoo import models, fields, api
+
+
+class TafSyncCheckpoint(models.Model):
+    _name = 'taf.sync.checkpoint'
+    _description = 'TAF Sync Checkpoint'
+    _rec_name = 'hospital'
+
+    hospital = fields.Char(string="Hospital ID", required=True, index=True)
+    last_booking_date = fields.Datetime(
+        string="High-Water Mark",
+        help="Latest booking/update timestamp stored by a completed sync run.")
+    window_since = fields.Datetime(
+        string="Current Window Start",
+        help="High-water mark the in-progress run asked the API for; kept so a resumed run requests the same window.")
+    page_cursor = fields.Integer(
+        string="Next Page", default=0,
+        help="Next page of the in-progress run; 0 when no run is in progress.")
+    last_run = fields.Datetime(string="Last Run")
+    records_synced = fields.Integer(string="Records in Last Run")
+
+    _sql_constraints = [
+        ('hospital_uniq', 'unique(hospital)', 'A checkpoint already exists for this hospital.'),
+    ]
+
+    @api.model
+    def _get_for_hospital(self, hospital):
+        """Return the checkpoint of ``hospital``, creating it on first use."""
+        checkpoint = self.search([('hospital', '=', hospital)], limit=1)
+        return checkpoint or self.create({'hospital': hospital})
@@ -0,0 +1,168 @@
+import json
+import logging
+
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+# Types accepted for the appointment fields read by ``taf.bookings._parse_api_item``
+APPOINTMENT_FIELD_TYPES = {'bookingDate': (int, float), 'name': str, 'healthConcerns': list}
+USER_FIELD_TYPES = {
+    'firstName': str, 'lastName': str, 'email': str, 'phoneNumber': (str, int),
+    'dob': (int, float), 'age': (int, float, str),
+}
+
+
+class TafWebhookEvent(models.Model):
+    _name = 'taf.webhook.event'
+    _description = 'TAF Webhook Event'
+    _order = 'id'
+
+    kind = fields.Selection([
+        ('appointment', 'Appointment'),
+        ('status', 'Status Update'),
+    ], string="Event Type", required=True)
+    appointment_id = fields.Char(string="Appointment ID", index=True)
+    payload = fields.Text(string="Payload", required=True)
+    state = fields.Selection([
+        ('pending', 'Waiting'),
+        ('done', 'Applied'),
+        ('failed', 'Failed'),
+    ], string="State", required=True, default='pending', index=True)
+    error = fields.Text(string="Error")
+
+    # Events applied per cron iteration
+    BATCH_SIZE = 1000
+
+    @api.model
+    def _validate_event(self, event):
+        """Classify one pushed event, checking the fields the cron reads have the expected types.
+
+        :return: ``(kind, appointment_id)``; ``kind`` is ``None`` when the event is invalid
+        """
+        if not isinstance(event, dict):
+            return None, None
+        appointment_id = event.get('_id') or event.get('appointmentId')
+        if not isinstance(appointment_id, str) or not appointment_id:
+            return None, None
+        status = event.get('status')
+        if status is not None and not (isinstance(status, str)
+                                       and status.lower() in self.env['taf.bookings'].API_STATUS_MAPPING):
+            return None, None
+        user = event.get('user')
+        if isinstance(user, dict) and user.get('_id'):
+            if not isinstance(user['_id'], str) or not self._check_types(user, USER_FIELD_TYPES) \
+                    or not self._check_types(event, APPOINTMENT_FIELD_TYPES):
+                return None, None
+            concerns = event.get('healthConcerns')
+            if concerns is not None and not all(isinstance(concern, str) for concern in concerns):
+                return None, None
+            return 'appointment', appointment_id
+        if status and set(event) <= {'_id', 'appointmentId', 'status', 'updatedAt'}:
+            return 'status', appointment_id
+        return None, None
+
+    @api.model
+    def _check_types(self, values, field_types):
+        """Whether each of ``field_types`` present and set in ``values`` has one of its types (booleans are not numbers)."""
+        return all(
+            values.get(field) is None
+            or (isinstance(values[field], types) and not isinstance(values[field], bool))
+            for field, types in field_types.items()
+        )
+
+    @api.model
+    def _enqueue_events(self, events):
+        """Validate and queue pushed events; return ``(accepted, rejected)`` counts."""
+        vals_list = []
+        for event in events:
+            kind, appointment_id = self._validate_event(event)
+            if kind:
+                vals_list.append({'kind': kind, 'appointment_id': appointment_id, 'payload': json.dumps(event)})
+        if vals_list:
+            self.create(vals_list)
+            cron = self.env.ref('taf.ir_cron_taf_webhook_events', raise_if_not_found=False)
+            if cron:
+                cron._trigger()
+        return len(vals_list), len(events) - len(vals_list)
+
+    @api.model
+    def _cron_apply_events(self):
+        """Apply queued events in batches through the same bulk upsert as the polling sync.
+
+        A failing batch is retried one event at a time, so only the events
+        that still fail are marked failed. Status events for an appointment
+        that is not stored yet are marked failed too, to be retried once it is.
+        """
+        TafBookings = self.env['taf.bookings']
+        while True:
+            self.env.cr.execute("""
+                SELECT id FROM taf_webhook_event
+                 WHERE state = 'pending'
+                 ORDER BY id
+                 LIMIT %s
+                   FOR UPDATE SKIP LOCKED
+            """, [self.BATCH_SIZE])
+            events = self.browse(row[0] for row in self.env.cr.fetchall())
+            if not events:
+                break
+            try:
+                with self.env.cr.savepoint():
+                    unknown = events._apply()
+            except Exception:
+                _logger.warning("⚠️ Applying %d TAF webhook events failed, applying them one by one", len(events))
+                self.env.invalidate_all(flush=False)
+                unknown = events._apply_one_by_one()
+            if unknown:
+                _logger.warning("⚠️ %d TAF status events refer to unknown appointments: %s",
+                                len(unknown), ', '.join(unknown.mapped('appointment_id')))
+                unknown.write({'state': 'failed', 'error': "Unknown appointment"})
+            applied = events.filtered(lambda event: event.state == 'pending')
+            applied.write({'state': 'done', 'error': False})
+            _logger.info("✅ Applied %d TAF webhook events.", len(applied))
+            TafBookings._commit_sync_chunk()
+            if len(events) < self.BATCH_SIZE:
+                break
+
+    def _apply_one_by_one(self):
+        """Apply each event in its own savepoint, marking the ones that fail; return the unknown ones like ``_apply``."""
+        unknown = self.browse()
+        for event in self:
+            try:
+                with self.env.cr.savepoint():
+                    unknown |= event._apply()
+            except Exception as e:
+                _logger.exception("❌ Failed to apply TAF webhook event %s", event.id)
+                self.env.invalidate_all(flush=False)
+                event.write({'state': 'failed', 'error': str(e)})
+        return unknown
+
+    def _apply(self):
+        """Apply the events and return the status events whose appointment is not stored."""
+        TafBookings = self.env['taf.bookings']
+        appointments = self.filtered(lambda event: event.kind == 'appointment')
+        if appointments:
+            TafBookings._bulk_upsert_bookings([json.loads(event.payload) for event in appointments])
+
+        # Later events win: keep the last status pushed for each appointment
+        statuses = {}
+        for event in self - appointments:
+            api_status = json.loads(event.payload)['status'].lower()
+            statuses[event.appointment_id] = TafBookings.API_STATUS_MAPPING[api_status]
+        if not statuses:
+            return self.browse()
+        bookings = TafBookings.search_fetch([('appointment_id', 'in', list(statuses))], ['appointment_id', 'status'])
+        by_status = {}
+        for booking in bookings:
+            status = statuses[booking.appointment_id]
+            if booking.status != status:
+                by_status[status] = by_status.get(status, TafBookings) | booking
+        for status, changed in by_status.items():
+            # The change comes from the API and must not be pushed back to it
+            changed.with_context(taf_skip_push=True).write({'status': status})
+        known = set(bookings.mapped('appointment_id'))
+        return (self - appointments).filtered(lambda event: event.appointment_id not in known)
+
+    def action_retry(self):
+        """Re-queue failed events."""
+        self.write({'state': 'pending', 'error': False})
@@ -0,0 +1,30 @@
+import json
+
+from odoo.tests.common import BaseCase
+
+from ..tools.json_stream import iter_json_array
+
+
+class TestJsonStream(BaseCase):
+    """``iter_json_array`` yields the same items however the response is split into chunks."""
+
+    DOCUMENT = json.dumps({
+        'took': 1.5,
+        'meta': {'scores': [1e5, -2.25e-3, True, None]},
+        'result': [1.5, 1e5, -20, 0, {'fee': 325.0, 'name': 'Ayurvéda'}, [True, False, None], 'end'],
+        'count': 12,
+    }).encode()
+
+    def _split(self, size):
+        return [self.DOCUMENT[index:index + size] for index in range(0, len(self.DOCUMENT), size)]
+
+    def test_single_byte_chunks(self):
+        expected = json.loads(self.DOCUMENT)['result']
+        for size in (1, 2, 3, 7, len(self.DOCUMENT)):
+            with self.subTest(size=size):
+                self.assertEqual(list(iter_json_array(self._split(size), 'result')), expected)
+
+    def test_number_split_after_point_or_exponent(self):
+        self.assertEqual(list(iter_json_array([b'{"result": [1.', b'5]}'], 'result')), [1.5])
+        self.assertEqual(list(iter_json_array([b'{"result": [1e', b'5]}'], 'result')), [1e5])
+        self.assertEqual(list(iter_json_array([b'{"took": 1.', b'5, "result": [2]}'], 'result')), [2])
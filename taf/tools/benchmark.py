@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""Throughput benchmark of the TAF sync against the local mock API.
+
+Run from an Odoo shell on a database with the ``taf`` module installed::
+
+    odoo-bin shell -d bench_db
+    >>> from odoo.addons.taf.tools.benchmark import run_benchmarks
+    >>> run_benchmarks(env)
+
+Every scenario starts its own ``mock_api`` server, points the module at it
+through the ``taf.api_*_url`` system parameters and runs inside a savepoint
+that is rolled back afterwards, so the database is left as it was. For each
+run the wall time, SQL query count, peak Python memory and records per
+second are logged and returned.
+"""
+import logging
+import time
+import tracemalloc
+
+from .mock_api import MockConfig, start_server
+
+_logger = logging.getLogger(__name__)
+
+# (name, mock server options, number of hospitals synced)
+SCENARIOS = [
+    ('1k appointments', {'appointments': 1000}, 1),
+    ('10k appointments', {'appointments': 10000}, 1),
+    ('100k appointments', {'appointments': 100000}, 1),
+    ('10k, 80% returning patients', {'appointments': 10000, 'duplicate_ratio': 0.8}, 1),
+    ('1k, 200ms responses', {'appointments': 1000, 'latency': 0.2}, 1),
+    ('1k, 5xx bursts', {'appointments': 1000, 'error_every': 3, 'error_burst': 2}, 1),
+    ('4 hospitals x 5k, 200ms responses', {'appointments': 5000, 'latency': 0.2}, 4),
+]
+BENCHMARK_HOSPITAL = 'benchmark-hospital-%d'
+
+
+class _Rollback(Exception):
+    """Raised to roll back the savepoint wrapping a benchmark run."""
+
+
+def measure(env, func):
+    """Run ``func()`` and return ``(result, metrics)`` with wall time, queries and peak memory."""
+    queries = env.cr.sql_log_count
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = func()
+    finally:
+        wall_time = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, {
+        'wall_time': round(wall_time, 3),
+        'queries': env.cr.sql_log_count - queries,
+        'peak_memory_mb': round(peak / 2 ** 20, 1),
+    }
+
+
+def _run_isolated(env, config, func, hospitals=1):
+    """Run ``func(env, base_url)`` against a fresh mock server, then roll everything back.
+
+    The configured hospitals are archived for the run and replaced by
+    ``hospitals`` synthetic ones served by the mock.
+    """
+    server, base_url = start_server(config)
+    outcome = {}
+    try:
+        with env.cr.savepoint():
+            params = env['ir.config_parameter'].sudo()
+            params.set_param('taf.api_list_url', base_url + '/api/appointment/list')
+            params.set_param('taf.api_status_url', base_url + '/api/appointment/{appointment_id}')
+            env['taf.hospital'].search([]).active = False
+            env['taf.hospital'].create([
+                {'name': BENCHMARK_HOSPITAL % index, 'code': BENCHMARK_HOSPITAL % index}
+                for index in range(hospitals)
+            ])
+            outcome['result'], outcome['metrics'] = measure(env, lambda: func(env, base_url))
+            raise _Rollback()
+    except _Rollback:
+        pass
+    finally:
+        server.shutdown()
+        server.server_close()
+        # The rolled back parameters may still sit in the ormcache
+        env.registry.clear_cache()
+        env.invalidate_all()
+    return outcome['result'], outcome['metrics']
+
+
+def bench_fetch(env, config, hospitals=1):
+    """Benchmark a full ``fetch_and_store_users`` run over ``config.appointments`` items per hospital."""
+    TafBookings = env['taf.bookings'].with_context(taf_sync_no_commit=True)
+    return _run_isolated(env, config, lambda env, url: TafBookings.fetch_and_store_users(full_sync=True), hospitals)
+
+
+def bench_status_push(env, config, sample=200):
+    """Benchmark ``sample`` sequential ``update_appointment_status_api`` calls."""
+    hospital = BENCHMARK_HOSPITAL % 0
+    appointment_ids = [config.appointment(hospital, index)['_id'] for index in range(sample)]
+
+    def push(env, url):
+        TafBookings = env['taf.bookings']
+        return sum(TafBookings.update_appointment_status_api(appointment_id, 'completed')
+                   for appointment_id in appointment_ids)
+
+    return _run_isolated(env, config, push)
+
+
+def _report(name, operation, records, result, metrics):
+    row = dict(metrics, scenario=name, operation=operation, records=records, result=result)
+    row['records_per_second'] = round(records / metrics['wall_time'], 1) if metrics['wall_time'] else None
+    _logger.info(
+        "%-30s %-14s %7d rec %8.3fs %7d queries %7.1f MB %10s rec/s  %s",
+        name, operation, records, metrics['wall_time'], metrics['queries'],
+        metrics['peak_memory_mb'], row['records_per_second'], result,
+    )
+    return row
+
+
+def run_benchmarks(env, scenarios=SCENARIOS, status_sample=200):
+    """Run the fetch and status-push benchmarks for every scenario and return the report rows."""
+    rows = []
+    for name, options, hospitals in scenarios:
+        config = MockConfig(**options)
+        result, metrics = bench_fetch(env, config, hospitals)
+        rows.append(_report(name, 'fetch', config.appointments * hospitals, result, metrics))
+
+        config = MockConfig(**options)
+        sample = min(status_sample, config.appointments)
+        result, metrics = bench_status_push(env, config, sample)
+        rows.append(_report(name, 'status push', sample, '%d/%d delivered' % (result, sample), metrics))
+    return rows
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""Process-wide pooled HTTP session for the TAF API.
+
+Reusing one ``requests.Session`` keeps TCP/TLS connections alive between
+calls, and its adapter pool is sized for the worker threads that share it.
+"""
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+_lock = threading.Lock()
+_sessions = {}
+
+
+def get_session(pool_size=10):
+    """Return the shared session whose connection pool holds ``pool_size`` connections per host."""
+    session = _sessions.get(pool_size)
+    if session is None:
+        with _lock:
+            session = _sessions.get(pool_size)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _sessions[pool_size] = session
+    return session
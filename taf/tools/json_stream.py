@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""Incremental parsing of large JSON API responses.
+
+The TAF appointment list is a JSON object whose ``result`` key holds the
+appointments. ``iter_json_array`` yields those items one at a time from the
+raw response chunks, so memory stays bounded by the size of a single item
+instead of the whole response.
+"""
+import codecs
+import json
+
+_WHITESPACE = ' \t\n\r'
+# Characters that can follow a complete number
+_NUMBER_END = _WHITESPACE + ',]}'
+
+
+class _ChunkBuffer:
+    """Text buffer fed lazily from an iterator of byte or str chunks."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self.text = ''
+        self.pos = 0
+        self.exhausted = False
+
+    def fill(self):
+        """Append the next chunk to the buffer; return False once the source is exhausted."""
+        # Drop what has already been consumed so the buffer never grows with the response.
+        self.text = self.text[self.pos:]
+        self.pos = 0
+        for chunk in self._chunks:
+            if isinstance(chunk, bytes):
+                chunk = self._decoder.decode(chunk)
+            if chunk:
+                self.text += chunk
+                return True
+        self.exhausted = True
+        return False
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it ('' at end of input)."""
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError("Malformed JSON stream: expected %r, found %r" % (char, found))
+        self.pos += 1
+
+    def decode_value(self, decoder):
+        """Decode one complete JSON value starting at the current position."""
+        self.peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # A scalar ending exactly at the buffer edge may be truncated (e.g. ``12`` of ``123``),
+            # and so may a number followed by anything but a delimiter (``1`` of ``1.5`` or ``1e5``).
+            truncated = end == len(self.text) or (
+                isinstance(value, (int, float)) and not isinstance(value, bool)
+                and self.text[end] not in _NUMBER_END
+            )
+            if truncated and not self.exhausted and self.fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_json_array(chunks, key):
+    """Yield the items of the array stored under ``key`` in a top-level JSON object.
+
+    :param chunks: iterable of ``bytes`` or ``str`` pieces of the document,
+        e.g. ``response.iter_content(chunk_size=65536)``
+    :param key: name of the top-level key holding the array
+    """
+    decoder = json.JSONDecoder()
+    buffer = _ChunkBuffer(chunks)
+    buffer.expect('{')
+    while buffer.peek() not in ('}', ''):
+        name = buffer.decode_value(decoder)
+        buffer.expect(':')
+        if name != key:
+            buffer.decode_value(decoder)
+        elif buffer.peek() == '[':
+            buffer.expect('[')
+            while buffer.peek() != ']':
+                yield buffer.decode_value(decoder)
+                if buffer.peek() == ',':
+                    buffer.pos += 1
+            buffer.expect(']')
+        else:
+            buffer.decode_value(decoder)
+        if buffer.peek() == ',':
+            buffer.pos += 1
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""Local stand-in for the TAF appointment API.
+
+Serves the two endpoints the ``taf`` module talks to:
+
+* ``GET /api/appointment/list?hospital=...&since=...&page=...&limit=...``
+* ``PUT /api/appointment/<appointment_id>``
+
+Appointments are generated deterministically from their index, so even
+100k-item payloads cost no server memory, and list responses are written
+in chunks like a real streaming backend. Run it standalone::
+
+    python taf/tools/mock_api.py --appointments 10000 --port 8765
+
+then point the module at it with the ``taf.api_list_url`` /
+``taf.api_status_url`` system parameters, or use ``benchmark.py`` which
+does both.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Fixed epoch (2024-01-01 UTC, in ms) so generated payloads are reproducible
+BASE_TIMESTAMP = 1704067200000
+STATUSES = ('Pending', 'Confirmed', 'Completed', 'Cancelled')
+CONCERNS = ('Back pain', 'Diabetes', 'Hypertension', 'Insomnia', 'Migraine', 'Arthritis')
+# Letters only, as appointment.booking rejects patient names with digits
+FIRST_NAMES = ('Asha', 'Ravi', 'Meena', 'Arjun', 'Lakshmi', 'Kiran', 'Priya', 'Suresh', 'Divya', 'Vijay')
+LAST_NAMES = ('Rao', 'Sharma', 'Reddy', 'Iyer', 'Nair', 'Patel', 'Menon', 'Gupta', 'Das', 'Verma')
+
+
+class MockConfig:
+    """Shape of the synthetic dataset and of the server's misbehaviour.
+
+    :param appointments: number of appointments per hospital
+    :param duplicate_ratio: share of appointments booked by an already used patient
+    :param latency: seconds slept before answering each request
+    :param error_every: every ``error_every``-th request starts a 5xx burst (0 disables)
+    :param error_burst: number of consecutive requests answered with 503 in a burst
+    :param seed: random seed of the generated data
+    """
+
+    def __init__(self, appointments=1000, duplicate_ratio=0.2, latency=0.0,
+                 error_every=0, error_burst=1, seed=42):
+        self.appointments = appointments
+        self.duplicate_ratio = duplicate_ratio
+        self.latency = latency
+        self.error_every = error_every
+        self.error_burst = error_burst
+        self.seed = seed
+        self._requests = 0
+        self._burst_left = 0
+        self._lock = threading.Lock()
+        self.status_updates = {}
+
+    def should_fail(self):
+        """Count a request and tell whether it falls in a 5xx burst."""
+        with self._lock:
+            self._requests += 1
+            if self.error_every and self._requests % self.error_every == 0:
+                self._burst_left = self.error_burst
+            if self._burst_left:
+                self._burst_left -= 1
+                return True
+            return False
+
+    def appointment(self, hospital, index):
+        """Return the synthetic appointment number ``index`` of ``hospital``."""
+        rng = random.Random('%s-%s-%s' % (self.seed, hospital, index))
+        if index and rng.random() < self.duplicate_ratio:
+            user_index = rng.randrange(index)
+        else:
+            user_index = index
+        appointment_id = '%s%08x' % (hospital[-8:], index)
+        return {
+            '_id': appointment_id,
+            'bookingDate': BASE_TIMESTAMP + index * 60000,
+            'status': self.status_updates.get(appointment_id, rng.choice(STATUSES)),
+            'healthConcerns': rng.sample(CONCERNS, rng.randint(0, 3)),
+            'name': 'Dr. Mock %d' % rng.randint(1, 20),
+            'user': {
+                '_id': 'user-%s-%d' % (hospital[-8:], user_index),
+                'firstName': FIRST_NAMES[user_index % len(FIRST_NAMES)],
+                'lastName': LAST_NAMES[user_index // len(FIRST_NAMES) % len(LAST_NAMES)],
+                'email': 'patient%d@example.com' % user_index,
+                'phoneNumber': 9100000000 + user_index,
+                'age': 20 + user_index % 60,
+                'dob': BASE_TIMESTAMP - (20 + user_index % 60) * 31557600000,
+            },
+        }
+
+
+class MockTafHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    @property
+    def config(self):
+        return self.server.config
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _misbehave(self):
+        """Apply the configured latency; answer 503 and return True inside an error burst."""
+        if self.config.latency:
+            time.sleep(self.config.latency)
+        if self.config.should_fail():
+            self._reply(503, {'success': False, 'message': 'Service Unavailable'})
+            return True
+        return False
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != '/api/appointment/list':
+            return self._reply(404, {'success': False})
+        if self._misbehave():
+            return
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        hospital = query.get('hospital', 'hospital')
+        limit = int(query.get('limit', self.config.appointments) or self.config.appointments)
+        page = max(int(query.get('page', 1)), 1)
+        since = int(query.get('since', 0))
+
+        # Appointments are ordered by bookingDate, so ``since`` maps to a start index
+        first = max((since - BASE_TIMESTAMP) // 60000 + 1, 0) if since else 0
+        start = first + (page - 1) * limit
+        stop = min(start + limit, self.config.appointments)
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        self._write_chunk(b'{"success":true,"result":[')
+        for batch_start in range(start, stop, 500):
+            batch = [json.dumps(self.config.appointment(hospital, index))
+                     for index in range(batch_start, min(batch_start + 500, stop))]
+            separator = ',' if batch_start > start else ''
+            self._write_chunk((separator + ','.join(batch)).encode())
+        self._write_chunk(b']}')
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _write_chunk(self, data):
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+
+    def do_PUT(self):
+        url = urlparse(self.path)
+        prefix = '/api/appointment/'
+        if not url.path.startswith(prefix):
+            return self._reply(404, {'success': False})
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        if self._misbehave():
+            return
+        if body.get('status') not in STATUSES:
+            return self._reply(400, {'success': False, 'message': 'Invalid status'})
+        self.config.status_updates[url.path[len(prefix):]] = body['status']
+        self._reply(200, {'success': True})
+
+
+def make_server(config, host='127.0.0.1', port=0):
+    """Create (without starting) a mock server; ``port=0`` picks a free port."""
+    server = ThreadingHTTPServer((host, port), MockTafHandler)
+    server.daemon_threads = True
+    server.config = config
+    return server
+
+
+def start_server(config, host='127.0.0.1', port=0):
+    """Start a mock server in a background thread and return ``(server, base_url)``."""
+    server = make_server(config, host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, 'http://%s:%d' % server.server_address[:2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--appointments', type=int, default=1000)
+    parser.add_argument('--duplicate-ratio', type=float, default=0.2)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds per request")
+    parser.add_argument('--error-every', type=int, default=0, help="start a 503 burst every N requests")
+    parser.add_argument('--error-burst', type=int, default=1, help="length of each 503 burst")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    config = MockConfig(args.appointments, args.duplicate_ratio, args.latency,
+                        args.error_every, args.error_burst, args.seed)
+    server = make_server(config, args.host, args.port)
+    print("Mock TAF API listening on http://%s:%d" % server.server_address[:2])
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()